@@ -1,5 +1,10 @@
 # file __init__.py
-import os, sys, json, subprocess
+import time
+
+# 插件模块导入耗时（记录到性能统计中）
+_IMPORT_START = time.perf_counter()
+
+import os, sys, json, copy, subprocess, threading
 
 ADDON_ROOT = os.path.dirname(__file__)
 VENDOR = os.path.join(ADDON_ROOT, "vendor")
@@ -8,14 +13,18 @@ if VENDOR not in sys.path:
 
 import re
 import html
-import asyncio
-import edge_tts
-import langdetect
-from langdetect.lang_detect_exception import LangDetectException
+import concurrent.futures
+
+# edge_tts / aiohttp / langdetect / tabulate 等较重的依赖在首次使用时才导入
+# （engine、batch、detection、ratelimit 模块），不拖慢 Anki 启动
+from .cache import TTSCache, make_key
+from .catalog import VoiceCatalog, VoiceResolver, fetch_voices
+from .storage import MediaContentIndex, cleanup_partial_files
+from . import perf
 
 from aqt import mw
 from aqt.qt import *
-from aqt.utils import showInfo, tooltip
+from aqt.utils import showInfo, showText, tooltip
 from aqt.editor import Editor
 from anki.hooks import addHook
 
@@ -44,7 +53,27 @@ DEFAULT_CONFIG = {
     # 其他参数保持不变
     "speech_rate": "+0%",
     "volume": "+0%",
-    "cache_enabled": True
+    "cache_enabled": True,
+    # 缓存索引的条目数上限，0 表示不限制（只淘汰索引，不删除媒体文件）
+    "cache_max_entries": 50000,
+    # 批量生成：并发请求数与失败重试次数
+    "batch_concurrency": 4,
+    "batch_max_retries": 3,
+    # 批量生成：把不超过指定字数的短文本合并为一次请求
+    "batch_pack_short_texts": True,
+    "batch_pack_max_chars": 30,
+    # 对 Edge 服务的请求速率（每秒）与最大并发，被限流时会自动降低
+    "max_requests_per_second": 5,
+    "max_concurrent_requests": 8,
+    # 复习时即时合成当前卡片的语音（不写入媒体文件夹），并预取接下来的卡片
+    "review_tts": False,
+    # 朗读的字段名，留空表示第一个字段
+    "review_tts_field": "",
+    "review_prefetch": 5,
+    # 复习语音缓存的大小上限（MB）
+    "review_cache_mb": 100,
+    # 是否把每条性能计时追加写入 perf_trace.jsonl
+    "perf_trace": False
 }
 
 def load_config():
@@ -56,7 +85,7 @@ def load_config():
                 user_cfg = json.load(f)
             
             # 从 DEFAULT_CONFIG 深拷贝开始
-            merged = json.loads(json.dumps(DEFAULT_CONFIG))
+            merged = copy.deepcopy(DEFAULT_CONFIG)
             merged.update(user_cfg)
             
             # 自动迁移旧版配置
@@ -83,149 +112,284 @@ def load_config():
     except Exception as e:
         print(f"配置加载失败，使用默认值: {e}")
     
-    return DEFAULT_CONFIG.copy
+    return copy.deepcopy(DEFAULT_CONFIG)
+
+# 当前配置，首次调用 get_config() 时加载
+CONFIG = None
+
+# 性能跟踪文件（perf_trace 开启时计时记录由后台线程按批追加写入）
+PERF_TRACE_PATH = os.path.join(ADDON_ROOT, "perf_trace.jsonl")
+
+def apply_perf_config():
+    perf.set_trace_path(PERF_TRACE_PATH if get_config().get("perf_trace") else None)
 
-CONFIG = load_config()
+# 语音缓存（持久化索引，首次使用时打开）
+CACHE_DB_PATH = os.path.join(ADDON_ROOT, "tts_cache.db")
+_tts_cache = None
 
-# 语音缓存
-_tts_cache = {}
+# 合成引擎
+_engine = None
+# 同步等待单条语音的最长时间（秒）
+SPEECH_TIMEOUT = 120
+
+# 语言检测器
+_detector = None
+
+# 语音目录（voices.json 缓存完整语音列表）与按配置构建的语音解析表
+VOICES_PATH = os.path.join(ADDON_ROOT, "voices.json")
+# 随插件附带的语音快照（离线且没有 voices.json 时使用）
+VOICES_SNAPSHOT_PATH = os.path.join(ADDON_ROOT, "voices_snapshot.json")
+_catalog = None
+_voice_resolver = None
+
+# 以上全局对象在首次使用时创建，预热线程与主线程可能同时调用 get_*()；
+# 创建过程由该锁串行化（可重入：get_engine 内部还会调用 get_cache 等）
+_init_lock = threading.RLock()
 
 def get_config():
+    global CONFIG
+    if CONFIG is None:
+        with _init_lock:
+            if CONFIG is None:
+                CONFIG = load_config()
+                apply_perf_config()
     return CONFIG
 
+def get_engine():
+    """常驻合成引擎（后台事件循环 + 连接池），首次使用时启动"""
+    global _engine
+    if _engine is None:
+        with _init_lock:
+            if _engine is None:
+                from .engine import SynthesisEngine
+                _engine = SynthesisEngine(
+                    media_index=MediaContentIndex(get_cache(), get_media_dir),
+                    limiter=make_limiter(),
+                )
+    return _engine
+
+def make_limiter():
+    from .ratelimit import AdaptiveLimiter
+    config = get_config()
+    return AdaptiveLimiter(
+        rate=config.get("max_requests_per_second", 5),
+        burst=config.get("max_requests_per_second", 5),
+        max_concurrency=config.get("max_concurrent_requests", 8),
+    )
+
+def shutdown_engine():
+    if _engine is not None:
+        _engine.shutdown()
+
+def get_cache():
+    global _tts_cache
+    if _tts_cache is None:
+        with _init_lock:
+            if _tts_cache is None:
+                # 媒体文件属于牌组、不会被删除，所以不按音频总大小限制
+                _tts_cache = TTSCache(
+                    CACHE_DB_PATH, max_entries=get_config().get("cache_max_entries", 0)
+                )
+    return _tts_cache
+
 # ------------------ TTS 核心功能 ------------------
 
+def get_detector():
+    """
+    语言检测器（首次使用时创建）：区分 voice_mapping 中的语言以及语音目录中有语音的语言，
+    未配置的语言也能被识别出来，再由语音解析表选用该语言最接近的语音
+    """
+    global _detector
+    # 与 get_voice_resolver 相同：reload_config 会把 _detector 置为 None
+    detector = _detector
+    if detector is None:
+        with _init_lock:
+            if _detector is None:
+                from .detection import LanguageDetector
+                mapped = set(get_config().get("voice_mapping", {}))
+                _detector = LanguageDetector(mapped | get_catalog().languages, preferred=mapped)
+            detector = _detector
+    return detector
+
 def detect_language(text):
     """
     更稳健的语言检测：
     - CJK（中/日/韩）优先检测（独立于 langdetect）
     - langdetect 仅作为辅助，并增加概率阈值/短文本特殊规则
     - 修复英文单词被判成法语的问题（如：beautiful -> fr）
+    具体实现见 detection.py（结果按文本记忆化）
     """
+    with perf.span("detect_language"):
+        return get_detector().detect(text)
 
-    # -------------------------------
-    # 预处理
-    # -------------------------------
-    clean = re.sub(r'<[^>]+>', '', text)
-    clean = re.sub(r'[0-9\W_]+', ' ', clean).strip()
-
-    if not clean:
-        return "en"
-
-    text_len = len(clean)
-
-    # -------------------------------
-    # ① CJK 绝对优先（不走 langdetect）
-    # -------------------------------
-    has_hanzi = bool(re.search(r'[\u4e00-\u9fff]', text))
-    has_kana  = bool(re.search(r'[\u3040-\u30ff]', text))
-    has_hangul = bool(re.search(r'[\uAC00-\uD7A3]', text))
-
-    if has_hangul:
-        return "ko"
-    if has_kana:
-        return "ja"
-    if has_hanzi:
-        return "zh"
-
-    # -------------------------------
-    # ② 极短文本处理（langdetect 对短词极不可靠）
-    # -------------------------------
-    # 单个英文单词 → 100% 视为英文
-    if text_len <= 8 and re.fullmatch(r"[A-Za-z]+", clean):
-        return "en"
-
-    # -------------------------------
-    # ③ langdetect 主检测（非 CJK）
-    # -------------------------------
-    try:
-        langdetect.DetectorFactory.seed = 0
-        langs = langdetect.detect_langs(clean)
-        best = langs[0]
-        lang, prob = best.lang, best.prob
-
-        # langdetect 常把英文短词判为法语/罗马尼亚语，需要修正
-        if lang in ("fr", "ro", "it", "id", "pt", "es") and text_len <= 12:
-            # 如果是纯英文字符，则认为是英文
-            if re.fullmatch(r"[A-Za-z]+", clean):
-                return "en"
-
-        # 置信度 < 0.75 → 不采用 langdetect，使用降级规则
-        if prob < 0.75:
-            raise LangDetectException("Low probability")
-
-        # 正常情况下返回 langdetect 结果
-        return lang[:2]
-
-    except LangDetectException:
-        pass
-
-    # -------------------------------
-    # ④ 降级字符系判断
-    # -------------------------------
-    if re.search(r'[\u0400-\u04FF]', text):
-        return "ru"
-    if re.search(r'[\u0600-\u06FF]', text):
-        return "ar"
-    if re.search(r'[\u0900-\u097F]', text):
-        return "hi"
-
-    # -------------------------------
-    # ⑤ 默认拉丁字母 → 英文
-    # -------------------------------
-    if re.search(r"[A-Za-z]", text):
-        return "en"
-
-    return "en"
-
-async def generate_speech_async(text, voice, rate, volume, output_filename):
-    """异步生成语音文件"""
-    try:
-        communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume)
-        await communicate.save(output_filename)
-        return True
-    except Exception as e:
-        showInfo(f"生成语音时出错: {str(e)}")
-        return False
+async def synthesize_async(text, voice, rate, volume, output_filename):
+    """
+    异步生成语音文件，返回最终文件路径（内容与已有媒体文件相同时为已有文件）
+    出错时直接抛出异常，且不会留下不完整的文件（须在合成引擎线程中运行）
+    """
+    return await get_engine().synthesize(text, voice, rate, volume, output_filename)
+
+async def synthesize_packed_async(texts, voice, rate, volume, output_filenames):
+    """把多条短文本合并为一次请求合成并切分到各自文件，返回各文件最终路径（须在合成引擎线程中运行）"""
+    return await get_engine().synthesize_packed(texts, voice, rate, volume, output_filenames)
+
+def get_catalog():
+    """语音目录：优先读取 voices.json，没有时由附带的快照和配置中的语音名称构造（离线可用）"""
+    global _catalog
+    if _catalog is None:
+        with _init_lock:
+            if _catalog is None:
+                config = get_config()
+                _catalog = VoiceCatalog.load(VOICES_PATH) or VoiceCatalog.from_names(
+                    [config.get("default_voice", "en-US-AriaNeural")]
+                    + list(config.get("voice_mapping", {}).values()),
+                    snapshot=VoiceCatalog.load_snapshot(VOICES_SNAPSHOT_PATH),
+                )
+    return _catalog
+
+def get_voice_resolver():
+    """语音解析表（配置加载后构建一次，同时校验配置中的语音名称）"""
+    global _voice_resolver
+    # 重载配置、刷新语音列表时会把 _voice_resolver 置为 None，先取到局部变量再判断
+    resolver = _voice_resolver
+    if resolver is None:
+        with _init_lock:
+            if _voice_resolver is None:
+                config = get_config()
+                _voice_resolver = VoiceResolver(
+                    get_catalog(),
+                    config.get("voice_mapping", {}),
+                    config.get("default_voice", "en-US-AriaNeural"),
+                )
+                for problem in _voice_resolver.problems:
+                    print(f"Edge TTS 配置: {problem}")
+            resolver = _voice_resolver
+    return resolver
+
+def refresh_voice_catalog(force=False):
+    """
+    语音目录过期时从服务端重新获取并保存（阻塞，不要在主线程中调用）
+    返回刷新后的目录；列表有变化时重建语音解析表
+    """
+    global _catalog, _detector, _voice_resolver
+    catalog = get_catalog()
+    if not force and not catalog.is_stale():
+        return catalog
+    voices = get_engine().run(fetch_voices(), timeout=60)
+    fresh = catalog.refreshed(voices)
+    fresh.save(VOICES_PATH)
+    if fresh is not catalog:
+        with _init_lock:
+            _catalog = fresh
+            # 语言列表可能变化：检测器与解析表都按新目录重建
+            _detector = None
+            _voice_resolver = None
+    return fresh
+
+def resolve_voice(text):
+    """检测语言并返回 (语言代码, 语音名称)"""
+    lang_code = detect_language(text)
+    # 查语音解析表；未配置的语言使用目录中最接近的语音，仍没有时使用默认语音
+    with perf.span("resolve_voice"):
+        voice = get_voice_resolver().voice_for(lang_code)
+    return lang_code, voice
+
+def get_media_dir():
+    """返回媒体目录，不存在时自动创建"""
+    media_dir = mw.col.media.dir()
+    if not os.path.exists(media_dir):
+        os.makedirs(media_dir)
+    return media_dir
 
-def generate_speech(text):
-    """生成语音并返回音频文件名"""
+def speech_cache_key(text, voice):
+    """缓存键：规范化文本 + 语音 + 语速 + 音量 + 输出格式 的稳定摘要"""
     config = get_config()
+    return make_key(text, voice, config["speech_rate"], config["volume"])
+
+def speech_output_path(cache_key, lang_code):
+    """根据缓存键生成输出文件的完整路径（相同内容在不同会话中文件名一致）"""
+    return os.path.join(get_media_dir(), f"tts_{lang_code}_{cache_key[:16]}.mp3")
+
+def lookup_cached_speech(cache_key, lang_code):
+    """依次检查缓存索引和媒体目录，命中时返回音频文件完整路径"""
+    if not get_config()["cache_enabled"]:
+        return None
+    with perf.span("cache_lookup") as fields:
+        path = _lookup_cached_speech(cache_key, lang_code)
+        fields["hit"] = path is not None
+    return path
+
+def _lookup_cached_speech(cache_key, lang_code):
+    cache = get_cache()
+    filename = cache.get(cache_key)
+    if filename is not None:
+        if mw.col.media.have(filename):
+            cache.record(hit=True)
+            return os.path.join(get_media_dir(), filename)
+        # 文件已被删除（例如“检查媒体”清理），索引失效
+        cache.discard(cache_key)
+
+    # 索引中没有，但媒体目录已有同名文件（例如从其他设备同步而来）
+    path = speech_output_path(cache_key, lang_code)
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        cache.record(hit=True)
+        remember_speech(cache_key, path)
+        return path
+
+    cache.record(hit=False)
+    return None
 
+def remember_speech(cache_key, path):
+    """把新生成的音频写入缓存索引"""
+    if get_config()["cache_enabled"]:
+        get_cache().put(cache_key, os.path.basename(path), os.path.getsize(path))
 
-    # 检测语言
-    lang_code = detect_language(text)
+def submit_speech(text):
+    """
+    提交语音合成任务，立即返回 concurrent.futures.Future（结果为音频文件完整路径）
+    - 语言检测与缓存查询在调用线程完成，命中缓存时返回已完成的 Future
+    - 网络合成在后台合成引擎中执行，不阻塞调用线程
+    """
+    config = get_config()
 
-    # 从映射表获取语音，若未配置则使用默认
-    voice_mapping = config.get("voice_mapping", {})
-    voice = voice_mapping.get(lang_code, config.get("default_voice", "en-US-AriaNeural"))
+    # 检测语言并选择语音
+    lang_code, voice = resolve_voice(text)
     
     # 检查缓存
-    cache_key = f"{text}_{voice}_{config['speech_rate']}_{config['volume']}"
-    if config["cache_enabled"] and cache_key in _tts_cache:
-        return _tts_cache[cache_key]
-    
-    # 确保媒体目录存在
-    media_dir = mw.col.media.dir()
-    if not os.path.exists(media_dir):
-        os.makedirs(media_dir)
+    cache_key = speech_cache_key(text, voice)
+    cached = lookup_cached_speech(cache_key, lang_code)
+    if cached:
+        future = concurrent.futures.Future()
+        future.set_result(cached)
+        return future
     
     # 生成唯一的输出文件名
-    output_filename = os.path.join(media_dir, f"tts_{lang_code}_{hash(cache_key)}.mp3")
-    
-    # 异步任务同步执行
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    success = loop.run_until_complete(
-        generate_speech_async(text, voice, config["speech_rate"], config["volume"], output_filename)
-    )
-    loop.close()
-    
-    if success:
-        if config["cache_enabled"]:
-            _tts_cache[cache_key] = output_filename
-        return output_filename
-    return None
+    output_filename = speech_output_path(cache_key, lang_code)
+
+    async def job():
+        path = await synthesize_async(
+            text, voice, config["speech_rate"], config["volume"], output_filename
+        )
+        remember_speech(cache_key, path)
+        return path
+
+    return get_engine().submit(job())
+
+def generate_speech(text, timeout=SPEECH_TIMEOUT):
+    """生成语音并返回音频文件名（同步等待，不要在主线程中调用）；超时或引擎关闭时返回 None"""
+    future = submit_speech(text)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.CancelledError:
+        return None
+    except Exception as e:
+        future.cancel()
+        print(f"生成语音时出错: {e}")
+        return None
+
+# 编辑器按钮：进行中的任务数显示在按钮文字上
+TTS_BUTTON_ID = "edge_tts_button"
+TTS_BUTTON_LABEL = "Edge TTS"
 
 def add_tts_button(buttons, editor):
     """在编辑器中添加TTS按钮"""
@@ -233,6 +397,8 @@ def add_tts_button(buttons, editor):
     b = editor.addButton(
         None, "Edge TTS", on_tts_clicked,
         tip="🔊生成语音 (Ctrl+T)", 
+        label=TTS_BUTTON_LABEL,
+        id=TTS_BUTTON_ID,
         keys="Ctrl+T"
     )
     buttons.append(b)
@@ -248,8 +414,22 @@ def strip_html_tags(text):
     text = text.replace('\xa0', ' ').replace('&nbsp;', ' ')
     return text
 
+# 编辑器中正在进行的合成任务：(id(note), 字段序号) -> (editor, note, 文本, Future)
+_editor_jobs = {}
+
+def update_tts_button(editor):
+    """（主线程）在按钮文字上显示该编辑器中进行中的任务数，全部完成后恢复原样"""
+    if editor.web is None:
+        return
+    count = sum(1 for job in _editor_jobs.values() if job[0] is editor)
+    label = f"{TTS_BUTTON_LABEL} ⏳{count}" if count else TTS_BUTTON_LABEL
+    editor.web.eval(
+        f"(function() {{ const button = document.getElementById({json.dumps(TTS_BUTTON_ID)});"
+        f" if (button) button.textContent = {json.dumps(label)}; }})();"
+    )
+
 def on_tts_clicked(editor):
-    """点击TTS按钮时的处理函数"""
+    """点击TTS按钮时的处理函数：提交后台合成，完成后在主线程插入音频标签"""
     # 获取当前字段文本
     current_field = editor.currentField
     if current_field is None:
@@ -263,17 +443,62 @@ def on_tts_clicked(editor):
    
     # 去掉 HTML
     plain_text = strip_html_tags(field_text)
-    # 生成语音
-    audio_file = generate_speech(plain_text)
-    
-    if audio_file:
-        # 将音频标签插入字段
-        audio_tag = f"[sound:{os.path.basename(audio_file)}]"
-        editor.note.fields[current_field] = f"{field_text}\n{audio_tag}"
-        editor.loadNote()
-        tooltip("语音已生成并添加到字段中")
+
+    # 同一字段重复触发：文本未变则合并，文本已变则取消旧任务
+    job_key = (id(editor.note), current_field)
+    running = _editor_jobs.get(job_key)
+    if running is not None:
+        _, _, running_text, running_future = running
+        if running_text == plain_text:
+            tooltip("语音正在生成中…")
+            return
+        running_future.cancel()
+
+    # 提交合成任务
+    try:
+        future = submit_speech(plain_text)
+    except Exception as e:
+        tooltip(f"语音生成失败: {e}")
+        return
+    _editor_jobs[job_key] = (editor, editor.note, plain_text, future)
+    if not future.done():
+        update_tts_button(editor)
+
+    def on_done(_future):
+        mw.taskman.run_on_main(lambda: on_speech_done(editor, job_key, future))
+
+    future.add_done_callback(on_done)
+
+def on_speech_done(editor, job_key, future):
+    """（主线程）合成完成后把音频标签写入原字段"""
+    _, note, _, current_future = _editor_jobs.get(job_key, (None, None, None, None))
+    if current_future is not future:
+        # 已被同一字段的新任务取代
+        return
+    del _editor_jobs[job_key]
+    update_tts_button(editor)
+    if future.cancelled():
+        return
+
+    error = future.exception()
+    if error is not None:
+        tooltip(f"语音生成失败: {error}")
+        return
+
+    # 将音频标签插入字段（写入任务发起时的笔记，即使编辑器已切换到其他笔记）
+    field_index = job_key[1]
+    audio_tag = f"[sound:{os.path.basename(future.result())}]"
+    note.fields[field_index] = f"{note.fields[field_index]}\n{audio_tag}"
+    if editor.note is note:
+        editor.loadNoteKeepingFocus()
+    elif note.id:
+        mw.col.update_note(note)
     else:
-        tooltip("语音生成失败")
+        tooltip("笔记已关闭，语音未添加")
+        return
+
+    remaining = f"（仍有 {len(_editor_jobs)} 个进行中）" if _editor_jobs else ""
+    tooltip(f"语音已生成并添加到字段中{remaining}")
 
 # ------------------ 菜单功能 ------------------
 def open_config_file():
@@ -294,9 +519,93 @@ def open_config_file():
 
 def reload_config():
     """重新加载配置"""
-    load_config()
+    global CONFIG, _detector, _voice_resolver
+    CONFIG = load_config()
+    apply_perf_config()
+    if _engine is not None:
+        _engine.limiter = make_limiter()
+    if _tts_cache is not None:
+        # 上限调小后立即按新上限淘汰
+        _tts_cache.max_entries = CONFIG.get("cache_max_entries", 0)
+        _tts_cache.evict()
+    # voice_mapping 可能已变化，下次检测时按新语言列表重建
+    with _init_lock:
+        _detector = None
+        _voice_resolver = None
+    problems = get_voice_resolver().problems
+    if problems:
+        showInfo("Edge TTS 配置已重新加载，但有以下问题：\n\n" + "\n".join(problems))
+        return
     showInfo("Edge TTS 配置已重新加载 ✅")
 
+def on_refresh_voices():
+    """从服务端刷新语音列表"""
+    def on_done(future):
+        try:
+            catalog = future.result()
+        except Exception as e:
+            showInfo(f"刷新语音列表失败: {e}")
+            return
+        problems = get_voice_resolver().problems
+        detail = "\n\n配置问题：\n" + "\n".join(problems) if problems else ""
+        showInfo(f"语音列表已更新，共 {len(catalog)} 个语音{detail}")
+
+    mw.taskman.run_in_background(lambda: refresh_voice_catalog(force=True), on_done)
+
+def show_cache_stats():
+    """显示缓存统计"""
+    stats = get_cache().stats()
+    total = stats["hits"] + stats["misses"]
+    hit_rate = f"{stats['hits'] / total:.0%}" if total else "-"
+    review = f"\n\n{load_review().stats_text()}" if get_config().get("review_tts") else ""
+    showInfo(
+        "Edge TTS 缓存统计\n\n"
+        f"条目数: {stats['entries']}\n"
+        f"音频总大小: {stats['bytes'] / 1024 / 1024:.1f} MB\n"
+        f"本次会话命中: {stats['hits']} / {total}（{hit_rate}）"
+        f"{review}"
+    )
+
+def show_perf_stats():
+    """显示各阶段耗时统计（p50 / p95）"""
+    from tabulate import tabulate
+    rows = perf.summary()
+    if not rows:
+        showInfo("暂无性能数据，生成语音后再查看")
+        return
+    table = tabulate(
+        [
+            [
+                row["name"],
+                row["count"],
+                f"{row['p50']:.1f}",
+                f"{row['p95']:.1f}",
+                f"{row['max']:.1f}",
+                f"{row['bytes'] / 1024:.0f}" if row["bytes"] else "",
+                f"{row['hit_rate']:.0%}" if row["hit_rate"] is not None else "",
+            ]
+            for row in rows
+        ],
+        headers=["阶段", "次数", "p50 ms", "p95 ms", "max ms", "KB", "命中率"],
+    )
+    limiter = ""
+    if _engine is not None:
+        state = _engine.limiter
+        limiter = (
+            f"\n\n限流器: 并发上限 {int(state.limit)}/{state.max_concurrency}，"
+            f"成功 {state.stats['ok']}，被限流 {state.stats['throttled']}，"
+            f"失败 {state.stats['failed']}，熔断 {state.stats['trips']} 次"
+        )
+        if state.is_open:
+            limiter += f"（暂停中，约 {state.resume_in:.0f} 秒后恢复）"
+    trace = f"\n\n跟踪文件: {PERF_TRACE_PATH}" if get_config().get("perf_trace") else ""
+    showText(
+        f"<pre>Edge TTS 性能统计（最近 {perf.RING_SIZE} 条记录）\n\n{html.escape(table)}"
+        f"{html.escape(limiter)}{html.escape(trace)}</pre>",
+        type="html",
+        title="Edge TTS 性能统计",
+    )
+
 def about_plugin():
     """显示插件说明"""
     msg = (
@@ -325,10 +634,93 @@ def setup_menu():
     action_reload.triggered.connect(reload_config)
     menu.addAction(action_reload)
 
+    action_batch = QAction("为当前牌组批量生成语音", mw)
+    action_batch.triggered.connect(lambda: load_batch().on_deck_batch())
+    menu.addAction(action_batch)
+
+    action_voices = QAction("刷新语音列表", mw)
+    action_voices.triggered.connect(on_refresh_voices)
+    menu.addAction(action_voices)
+
+    action_stats = QAction("缓存统计", mw)
+    action_stats.triggered.connect(show_cache_stats)
+    menu.addAction(action_stats)
+
+    action_perf = QAction("性能统计", mw)
+    action_perf.triggered.connect(show_perf_stats)
+    menu.addAction(action_perf)
+
     action_about = QAction("关于插件", mw)
     action_about.triggered.connect(about_plugin)
     menu.addAction(action_about)
 
-# 初始化插件
+def load_batch():
+    """批量生成模块（依赖 aiohttp / edge_tts），首次使用时导入"""
+    from . import batch
+    return batch
+
+def load_review():
+    """复习时即时合成模块，首次使用时导入"""
+    from . import review
+    return review
+
+def on_show_question():
+    """复习显示问题时：review_tts 开启才加载复习模块"""
+    if not get_config().get("review_tts", False):
+        return
+    try:
+        load_review().on_show_question()
+    except Exception as e:
+        print(f"Edge TTS 复习语音出错: {e}")
+
+def setup_review():
+    addHook("showQuestion", on_show_question)
+
+def warm_up():
+    """后台预热：导入合成相关模块并加载语言模型，首次点击按钮时无需等待"""
+    try:
+        with perf.span("warm_up"):
+            from . import engine, ratelimit
+            load_batch()
+            get_detector().model
+            get_voice_resolver()
+    except Exception as e:
+        print(f"Edge TTS 预热失败: {e}")
+        return
+    # 语音列表过期时在后台刷新（离线时继续使用已缓存的列表）
+    try:
+        refresh_voice_catalog()
+        # 目录有变化时检测器已按新的语言列表重置，重新加载概率表
+        get_detector().model
+    except Exception as e:
+        print(f"Edge TTS 语音列表刷新失败: {e}")
+
+def on_profile_loaded():
+    """主窗口就绪后：清理残留临时文件，并在后台线程中预热"""
+    cleanup_partial_files(get_media_dir())
+    threading.Thread(target=warm_up, name="edge-tts-warm-up", daemon=True).start()
+
+def setup_shutdown():
+    """打开配置文件时清理残留临时文件；关闭时断开连接、停止合成引擎，并写完性能跟踪记录"""
+    addHook("profileLoaded", on_profile_loaded)
+    addHook("unloadProfile", shutdown_engine)
+    # 写入跟踪文件中尚在缓冲的记录
+    addHook("unloadProfile", perf.flush)
+
+def setup_browser_menu(browser):
+    action = QAction("Edge TTS 批量生成语音", browser)
+    action.triggered.connect(lambda: load_batch().on_browser_batch(browser))
+    browser.form.menuEdit.addSeparator()
+    browser.form.menuEdit.addAction(action)
+
+def add_browser_menu():
+    """在浏览器「编辑」菜单中添加批量生成"""
+    addHook("browser.setupMenus", setup_browser_menu)
+
+# 初始化插件（只注册按钮、菜单与钩子，不加载配置和重型依赖）
 add_editor_buttons()
+add_browser_menu()
+setup_review()
+setup_shutdown()
 setup_menu()
+perf.record("addon_import", time.perf_counter() - _IMPORT_START)
@@ -0,0 +1,279 @@
+# file batch.py
+"""
+批量生成语音：
+- 浏览器菜单「为选中笔记批量生成语音」/ 工具菜单「为当前牌组批量生成语音」
+- 后台线程中运行 asyncio 流水线：有界并发、队列背压、403/网络错误退避重试
+- 服务端限流时由引擎的限流器自动降速 / 熔断暂停，进度框中显示暂停状态
+- 每完成一条立即写回笔记，中断后重新运行会跳过已有音频的笔记（可续跑）
+- 相同文本（去掉 HTML、规范化空白后）只合成一次，共享同一个媒体文件
+- 短文本（单词、短语）合并为一次请求合成，再按单词边界切回各自的文件
+"""
+import os
+import threading
+import concurrent.futures
+
+from aqt import mw
+from aqt.qt import *
+from aqt.utils import showInfo, tooltip
+from anki.collection import SearchNode
+from anki.utils import ids2str
+
+from . import (
+    get_config,
+    resolve_voice,
+    strip_html_tags,
+    synthesize_async,
+    synthesize_packed_async,
+    speech_cache_key,
+    speech_output_path,
+    get_cache,
+    get_engine,
+    lookup_cached_speech,
+    remember_speech,
+)
+from .cache import normalize_text
+from .pipeline import pack_jobs, run_pipeline_async
+
+# ------------------ 流水线 ------------------
+
+def run_pipeline(jobs, synthesize=synthesize_async, **kwargs):
+    """
+    同步入口：在合成引擎的事件循环中运行流水线，并阻塞当前（后台）线程直到完成
+    批量任务可能持续很久，因此不设超时；引擎关闭时抛出 concurrent.futures.CancelledError
+    """
+    kwargs.setdefault("synthesize_packed", synthesize_packed_async)
+    return get_engine().run(run_pipeline_async(jobs, synthesize, **kwargs))
+
+# ------------------ 任务构建 ------------------
+
+def build_jobs(note_ids, source_field, target_field, skip_existing=True):
+    """
+    读取笔记并生成任务列表，返回 (jobs, cached, skipped)
+    - 字段文本去掉 HTML 并规范化空白后，按 (文本, 语音, 语速, 音量) 分组，
+      每组只合成一次，job["nids"] 为共享同一音频文件的全部笔记
+    - cached 为已命中缓存、无需合成的分组
+    """
+    config = get_config()
+    groups = {}
+    skipped = 0
+    for nid in note_ids:
+        note = mw.col.get_note(nid)
+        if source_field not in note or target_field not in note:
+            skipped += 1
+            continue
+        if skip_existing and "[sound:" in note[target_field]:
+            skipped += 1
+            continue
+        text = normalize_text(strip_html_tags(note[source_field]))
+        if not text:
+            skipped += 1
+            continue
+        lang_code, voice = resolve_voice(text)
+        cache_key = speech_cache_key(text, voice)
+        group = groups.get(cache_key)
+        if group is None:
+            path = lookup_cached_speech(cache_key, lang_code)
+            group = groups[cache_key] = {
+                "nids": [],
+                "text": text,
+                "voice": voice,
+                "rate": config["speech_rate"],
+                "volume": config["volume"],
+                "key": cache_key,
+                "path": path or speech_output_path(cache_key, lang_code),
+                "cached": bool(path),
+            }
+        group["nids"].append(nid)
+
+    jobs = [group for group in groups.values() if not group["cached"]]
+    cached = [group for group in groups.values() if group["cached"]]
+    return jobs, cached, skipped
+
+def apply_results(results, target_field):
+    """
+    （主线程）把生成好的音频标签写回笔记；results 为 (nids, path) 列表
+    每次只调用一次 update_notes：逐条 update_note 会为每条笔记各产生一个撤销步骤
+    """
+    notes = {}
+    for nids, path in results:
+        audio_tag = f"[sound:{os.path.basename(path)}]"
+        for nid in nids:
+            note = notes.get(nid)
+            if note is None:
+                note = notes[nid] = mw.col.get_note(nid)
+            note[target_field] = f"{note[target_field]}\n{audio_tag}" if note[target_field] else audio_tag
+    if notes:
+        mw.col.update_notes(list(notes.values()))
+
+# ------------------ 界面 ------------------
+
+class BatchDialog(QDialog):
+    """选择源字段 / 目标字段的对话框"""
+
+    def __init__(self, parent, field_names):
+        super().__init__(parent)
+        self.setWindowTitle("Edge TTS 批量生成语音")
+        config = get_config()
+
+        self.source = QComboBox()
+        self.source.addItems(field_names)
+        self.target = QComboBox()
+        self.target.addItems(field_names)
+        if len(field_names) > 1:
+            self.target.setCurrentIndex(1)
+        self.skip_existing = QCheckBox("跳过目标字段已有音频的笔记")
+        self.skip_existing.setChecked(True)
+        self.concurrency = QSpinBox()
+        self.concurrency.setRange(1, 16)
+        self.concurrency.setValue(config.get("batch_concurrency", 4))
+
+        form = QFormLayout()
+        form.addRow("文本字段", self.source)
+        form.addRow("音频字段", self.target)
+        form.addRow("并发数", self.concurrency)
+        form.addRow(self.skip_existing)
+
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addWidget(buttons)
+
+def field_names_for_notes(note_ids):
+    """所选笔记涉及的所有笔记类型的字段名（保持顺序、去重）"""
+    mids = mw.col.db.list(f"select distinct mid from notes where id in {ids2str(note_ids)}")
+    names = []
+    for mid in mids:
+        for name in mw.col.models.field_names(mw.col.models.get(mid)):
+            if name not in names:
+                names.append(name)
+    return names
+
+def start_batch(parent, note_ids, on_finished=None):
+    """弹出设置对话框并在后台运行批量任务"""
+    if not note_ids:
+        tooltip("没有可处理的笔记")
+        return
+
+    dialog = BatchDialog(parent, field_names_for_notes(note_ids))
+    if not dialog.exec():
+        return
+
+    config = get_config()
+    source_field = dialog.source.currentText()
+    target_field = dialog.target.currentText()
+    skip_existing = dialog.skip_existing.isChecked()
+    concurrency = dialog.concurrency.value()
+
+    cancel_event = threading.Event()
+    lock = threading.Lock()
+    pending = []
+    progress = {"total": len(note_ids), "finished": 0, "saved_bytes": 0}
+
+    def flush():
+        # 主线程：写回已完成的结果并刷新进度
+        with lock:
+            results = pending[:]
+            del pending[:]
+            finished = progress["finished"]
+        if results:
+            apply_results(results, target_field)
+        if mw.progress.want_cancel():
+            cancel_event.set()
+        label = f"正在生成语音 {finished}/{progress['total']}"
+        limiter = get_engine().limiter
+        if limiter.is_open:
+            label += f"\n服务限流，暂停中（约 {limiter.resume_in:.0f} 秒后恢复）"
+        mw.progress.update(
+            label=label,
+            value=finished,
+            max=progress["total"],
+        )
+
+    def on_result(job, error):
+        saved_bytes = 0
+        if error is None:
+            remember_speech(job["key"], job["path"])
+            saved_bytes = os.path.getsize(job["path"]) * (len(job["nids"]) - 1)
+        with lock:
+            if error is None:
+                pending.append((job["nids"], job["path"]))
+                progress["saved_bytes"] += saved_bytes
+            progress["finished"] += 1
+        mw.taskman.run_on_main(flush)
+
+    def task():
+        jobs, cached, skipped = build_jobs(note_ids, source_field, target_field, skip_existing)
+        with lock:
+            pending.extend((group["nids"], group["path"]) for group in cached)
+            progress["total"] = len(jobs)
+        mw.taskman.run_on_main(flush)
+        queued = jobs
+        if config.get("batch_pack_short_texts", True):
+            queued = pack_jobs(jobs, config.get("batch_pack_max_chars", 30))
+        stats = run_pipeline(
+            queued,
+            concurrency=concurrency,
+            max_retries=config.get("batch_max_retries", 3),
+            on_result=on_result,
+            cancel_event=cancel_event,
+        )
+        stats["notes"] = sum(len(job["nids"]) for job in jobs)
+        stats["cached"] = sum(len(group["nids"]) for group in cached)
+        stats["saved_requests"] = stats["notes"] - len(jobs)
+        stats["saved_bytes"] = progress["saved_bytes"]
+        stats["skipped"] = skipped
+        return stats
+
+    def on_done(future):
+        timer.stop()
+        try:
+            try:
+                flush()
+            finally:
+                mw.progress.finish()
+            report(future)
+        finally:
+            # 出错、取消时已完成的结果同样已写回，浏览器也要刷新
+            if on_finished is not None:
+                on_finished()
+
+    def report(future):
+        try:
+            stats = future.result()
+        except concurrent.futures.CancelledError:
+            # 关闭配置文件时合成引擎停止，已完成的结果已在 flush 中写回
+            return
+        except Exception as e:
+            showInfo(f"批量生成语音时出错: {e}")
+            return
+        cancelled = "（已取消）" if cancel_event.is_set() else ""
+        showInfo(
+            f"批量生成完成{cancelled}\n\n"
+            f"合成请求: 成功 {stats['done']} / 失败 {stats['failed']}"
+            f"（共 {stats['notes']} 条笔记）\n"
+            f"缓存命中: {stats['cached']} 条笔记\n"
+            f"相同文本合并: 节省 {stats['saved_requests']} 次请求、"
+            f"{stats['saved_bytes'] / 1024:.0f} KB\n"
+            f"跳过: {stats['skipped']}"
+        )
+
+    get_cache()
+    mw.progress.start(label="正在准备批量任务…", immediate=True, parent=parent)
+    # 熔断暂停期间没有结果返回，定时刷新进度以显示暂停状态
+    timer = mw.progress.timer(1000, flush, True, parent=parent)
+    mw.taskman.run_in_background(task, on_done)
+
+def on_browser_batch(browser):
+    """浏览器：为选中的笔记批量生成"""
+    start_batch(browser, browser.selected_notes(), on_finished=browser.table.redraw_cells)
+
+def on_deck_batch():
+    """工具菜单：为当前牌组批量生成"""
+    deck_name = mw.col.decks.current()["name"]
+    note_ids = mw.col.find_notes(mw.col.build_search_string(SearchNode(deck=deck_name)))
+    start_batch(mw, note_ids)
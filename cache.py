@@ -0,0 +1,212 @@
+# file cache.py
+"""
+持久化的语音缓存索引：
+- 缓存键为 (规范化文本, 语音, 语速, 音量, 输出格式) 的 SHA-1 摘要，跨会话稳定
+- 索引保存在 SQLite 中（与 config.json 同目录），记录文件名、大小、最近使用时间
+- 支持按条目数 / 总大小做 LRU 淘汰，并统计命中 / 未命中次数
+- 另存音频内容哈希，用于发现字节完全相同的媒体文件；条目被淘汰时一并删除不再被引用的内容哈希，
+  内容哈希的行数同样不超过条目数上限
+上限约束的是索引本身（数据库的行数 / 记录的音频大小）。文件只有在 on_evict 中才会被删除：
+媒体文件夹中的文件属于牌组，淘汰后不删除，之后再用到时按文件名找回并重新记为最近使用的条目
+"""
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+# edge_tts 固定使用的输出格式（参与缓存键计算）
+OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+
+def normalize_text(text):
+    """规范化文本：NFC、合并空白、去掉首尾空白"""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+def make_key(text, voice, rate, volume, output_format=OUTPUT_FORMAT):
+    """计算稳定的缓存键（与进程、会话无关）"""
+    raw = "\x1f".join((normalize_text(text), voice, rate, volume, output_format))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class TTSCache:
+    """SQLite 缓存索引，线程安全"""
+
+    def __init__(self, db_path, max_entries=0, max_bytes=0, on_evict=None):
+        # max_entries / max_bytes 为 0 表示不限制
+        # on_evict(filename) 在条目被淘汰时调用，可用于删除缓存自有的文件
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "create table if not exists entries ("
+            " key text primary key,"
+            " filename text not null,"
+            " size integer not null default 0,"
+            " last_used real not null)"
+        )
+        self._db.execute("create index if not exists entries_lru on entries (last_used)")
+        # 音频内容哈希 -> 文件名，用于合并字节完全相同的媒体文件
+        self._db.execute(
+            "create table if not exists contents ("
+            " digest text primary key,"
+            " filename text not null)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        """查询缓存，存在时刷新最近使用时间并返回文件名（命中统计由调用方 record）"""
+        with self._lock:
+            row = self._db.execute(
+                "select filename from entries where key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "update entries set last_used = ? where key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            return row[0]
+
+    def record(self, hit):
+        """记录一次命中 / 未命中"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, filename, size=0):
+        """写入缓存条目，并按限制淘汰最久未使用的条目"""
+        with self._lock:
+            self._db.execute(
+                "insert or replace into entries (key, filename, size, last_used)"
+                " values (?, ?, ?, ?)",
+                (key, filename, size, time.time()),
+            )
+            evicted = self._evict_locked()
+            self._db.commit()
+        self._notify_evicted(evicted)
+
+    def discard(self, key):
+        """删除条目（例如对应文件已被用户删除）"""
+        with self._lock:
+            row = self._db.execute(
+                "select filename from entries where key = ?", (key,)
+            ).fetchone()
+            self._db.execute("delete from entries where key = ?", (key,))
+            if row is not None:
+                self._forget_contents_locked([row[0]])
+            self._db.commit()
+
+    def find_content(self, digest):
+        """按内容哈希查找已有的音频文件名"""
+        with self._lock:
+            row = self._db.execute(
+                "select filename from contents where digest = ?", (digest,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def add_content(self, digest, filename):
+        with self._lock:
+            self._db.execute(
+                "insert or replace into contents (digest, filename) values (?, ?)",
+                (digest, filename),
+            )
+            self._trim_contents_locked()
+            self._db.commit()
+
+    def evict(self):
+        """手动触发淘汰（例如配置修改后）"""
+        with self._lock:
+            evicted = self._evict_locked()
+            self._db.commit()
+        self._notify_evicted(evicted)
+
+    def clear(self):
+        with self._lock:
+            evicted = [row[0] for row in self._db.execute("select filename from entries")]
+            self._db.execute("delete from entries")
+            self._db.execute("delete from contents")
+            self._db.commit()
+            self.hits = self.misses = 0
+        self._notify_evicted(evicted)
+
+    def stats(self):
+        """返回条目数、总大小、内容哈希数以及本次会话的命中统计"""
+        with self._lock:
+            entries, total = self._db.execute(
+                "select count(*), coalesce(sum(size), 0) from entries"
+            ).fetchone()
+            contents = self._db.execute("select count(*) from contents").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": total,
+            "contents": contents,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _evict_locked(self):
+        """按 LRU 顺序淘汰超出限制的条目，返回被淘汰的文件名"""
+        evicted = self._evict_entries_locked()
+        self._forget_contents_locked(evicted)
+        self._trim_contents_locked()
+        return evicted
+
+    def _trim_contents_locked(self):
+        # 内容哈希没有使用时间：超出条目数上限时删除最早写入的
+        if self.max_entries:
+            self._db.execute(
+                "delete from contents where rowid in ("
+                " select rowid from contents order by rowid"
+                " limit max(0, (select count(*) from contents) - ?))",
+                (self.max_entries,),
+            )
+
+    def _forget_contents_locked(self, filenames):
+        # 多个条目可能指向同一文件（内容查重），仍被引用时保留
+        for filename in set(filenames):
+            self._db.execute(
+                "delete from contents where filename = ?"
+                " and not exists (select 1 from entries where filename = ?)",
+                (filename, filename),
+            )
+
+    def _evict_entries_locked(self):
+        entries, total = self._db.execute(
+            "select count(*), coalesce(sum(size), 0) from entries"
+        ).fetchone()
+        over_entries = self.max_entries and entries > self.max_entries
+        over_bytes = self.max_bytes and total > self.max_bytes
+        if not (over_entries or over_bytes):
+            return []
+
+        evicted = []
+        for key, filename, size in self._db.execute(
+            "select key, filename, size from entries order by last_used"
+        ).fetchall():
+            if not ((self.max_entries and entries > self.max_entries)
+                    or (self.max_bytes and total > self.max_bytes)):
+                break
+            self._db.execute("delete from entries where key = ?", (key,))
+            entries -= 1
+            total -= size
+            evicted.append(filename)
+        return evicted
+
+    def _notify_evicted(self, filenames):
+        if self.on_evict is None:
+            return
+        for filename in filenames:
+            try:
+                self.on_evict(filename)
+            except Exception as e:
+                print(f"清理缓存文件失败 {filename}: {e}")
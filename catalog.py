@@ -0,0 +1,187 @@
+# file catalog.py
+"""
+语音目录：
+- 来自 edge_tts.list_voices 的完整语音列表，保存在插件目录的 voices.json 中，过期（TTL）后在后台刷新
+- 刷新时比较内容摘要（类似 ETag）：列表没有变化时只更新时间戳，不重建索引和解析表
+- 按名称、(地区, 性别)、(语言, 性别) 建立索引，查找都是 O(1) 的字典访问
+- 没有缓存文件且无法联网时，用随插件附带的语音快照（voices_snapshot.json，每种语言一两个常用语音）
+  加上配置中出现的语音名称构造一个最小目录：离线也能为未配置的语言选择最接近的语音，
+  但快照不完整，不据此判断配置中的语音是否存在
+"""
+import json
+import time
+import hashlib
+from collections import Counter
+
+from .storage import AtomicWriter
+
+# 语音列表的有效期（秒）
+CATALOG_TTL = 7 * 24 * 3600
+
+def parse_voice_name(name):
+    """从语音名称（如 zh-CN-XiaoxiaoNeural）解析 (地区, 语言)；格式不对时返回 (None, None)"""
+    parts = (name or "").split("-")
+    if len(parts) < 3:
+        return None, None
+    return "-".join(parts[:-1]), parts[0].lower()
+
+def simplify(voices):
+    """只保留目录需要的字段：ShortName / Locale / Gender"""
+    return [
+        {"ShortName": voice["ShortName"], "Locale": voice["Locale"], "Gender": voice.get("Gender")}
+        for voice in voices
+    ]
+
+def voices_digest(voices):
+    return hashlib.sha1(
+        json.dumps(voices, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+async def fetch_voices(proxy=None):
+    """从服务端获取完整语音列表（须在事件循环中运行）"""
+    from edge_tts import list_voices
+    return simplify(await list_voices(proxy=proxy))
+
+class VoiceCatalog:
+    """语音目录及其索引"""
+
+    def __init__(self, voices, fetched=0.0, digest=None, complete=True):
+        # complete 为 False 表示由配置推导的最小目录：不能据此判断语音是否存在
+        self.voices = simplify(voices)
+        self.fetched = fetched
+        self.digest = digest or voices_digest(self.voices)
+        self.complete = complete
+        self.genders = {voice["ShortName"]: voice["Gender"] for voice in self.voices}
+        self.index = {}
+
+        # 同一语言中，语音最多的地区优先（en -> en-US，zh -> zh-CN），
+        # 其次是语言与地区同名的地区（fr -> fr-FR）
+        counts = Counter(voice["Locale"].lower() for voice in self.voices)
+        def priority(voice):
+            locale = voice["Locale"].lower()
+            language = locale.split("-")[0]
+            return -counts[locale], locale != f"{language}-{language}"
+
+        for voice in sorted(self.voices, key=priority):
+            locale = voice["Locale"].lower()
+            language = locale.split("-")[0]
+            for key in (
+                (locale, voice["Gender"]),
+                (locale, None),
+                (language, voice["Gender"]),
+                (language, None),
+            ):
+                self.index.setdefault(key, voice["ShortName"])
+
+    @classmethod
+    def from_names(cls, names, snapshot=()):
+        """用语音名称与附带的语音快照构造最小目录（离线兜底）"""
+        voices = simplify(snapshot)
+        known = {voice["ShortName"] for voice in voices}
+        for name in dict.fromkeys(names):
+            locale, _ = parse_voice_name(name)
+            if locale is not None and name not in known:
+                voices.append({"ShortName": name, "Locale": locale, "Gender": None})
+        return cls(voices, complete=False)
+
+    @staticmethod
+    def load_snapshot(path):
+        """读取随插件附带的语音快照；不存在或已损坏时返回空列表"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return simplify(json.load(f)["voices"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    @classmethod
+    def load(cls, path):
+        """读取缓存文件；不存在或已损坏时返回 None"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data["voices"], fetched=data.get("fetched", 0.0), digest=data.get("digest"))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path):
+        data = {"fetched": self.fetched, "digest": self.digest, "voices": self.voices}
+        with AtomicWriter(path) as writer:
+            writer.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+            writer.commit()
+
+    def __contains__(self, name):
+        return name in self.genders
+
+    def __len__(self):
+        return len(self.voices)
+
+    @property
+    def languages(self):
+        """目录中有语音的语言代码（如 en、pt）"""
+        return {voice["Locale"].split("-")[0].lower() for voice in self.voices}
+
+    def is_stale(self, ttl=CATALOG_TTL):
+        return not self.complete or time.time() - self.fetched > ttl
+
+    def refreshed(self, voices):
+        """用新获取的列表刷新；内容未变化时只更新时间戳并返回自身"""
+        voices = simplify(voices)
+        digest = voices_digest(voices)
+        if self.complete and digest == self.digest:
+            self.fetched = time.time()
+            return self
+        return VoiceCatalog(voices, fetched=time.time(), digest=digest)
+
+    def gender_of(self, name):
+        return self.genders.get(name)
+
+    def find(self, language, locale=None, gender=None):
+        """最接近的语音：同地区优先于同语言，同性别优先；没有时返回 None"""
+        keys = []
+        if locale:
+            keys += [(locale.lower(), gender), (locale.lower(), None)]
+        if language:
+            language = language.split("-")[0].lower()
+            keys += [(language, gender), (language, None)]
+        for key in keys:
+            name = self.index.get(key)
+            if name is not None:
+                return name
+        return None
+
+class VoiceResolver:
+    """
+    语言代码 -> 语音 的解析表，按配置与语音目录一次性构建：
+    配置中不存在的语音在构建时就替换为最接近的语音，并记录到 problems
+    """
+
+    def __init__(self, catalog, voice_mapping, default_voice):
+        self.catalog = catalog
+        self.problems = []
+        self.gender = None
+        self.default_voice = self._validate("default_voice", default_voice) or default_voice
+        self.gender = catalog.gender_of(self.default_voice)
+        self.table = {}
+        for lang_code, voice in voice_mapping.items():
+            self.table[lang_code] = (
+                self._validate(f"voice_mapping.{lang_code}", voice, lang_code) or self.default_voice
+            )
+
+    def _validate(self, field, name, lang_code=None):
+        if not self.catalog.complete or name in self.catalog:
+            return name
+        locale, language = parse_voice_name(name)
+        replacement = self.catalog.find(lang_code or language, locale=locale, gender=self.gender)
+        if replacement is not None:
+            self.problems.append(f"{field}: 语音 {name} 不存在，改用 {replacement}")
+        else:
+            self.problems.append(f"{field}: 语音 {name} 不存在")
+        return replacement
+
+    def voice_for(self, lang_code):
+        """未配置的语言使用目录中该语言最接近的语音，仍没有时使用默认语音"""
+        voice = self.table.get(lang_code)
+        if voice is None:
+            voice = self.catalog.find(lang_code, gender=self.gender) or self.default_voice
+            self.table[lang_code] = voice
+        return voice
@@ -0,0 +1,225 @@
+# file detection.py
+"""
+语言检测引擎（替代每次调用 langdetect.detect_langs）：
+- 一次预编译正则扫描得到文本包含的文字系统（韩/日/中/俄/阿/印地/拉丁）
+- 按规范化文本做 LRU 记忆化，批量任务中重复文本不再重复计算
+- 只加载需要区分的语言（voice_mapping 与语音目录中的语言）的 langdetect 概率表，
+  预先转换为 array 存储的稀疏对数概率表；检测时一次遍历全部 n-gram 累加得分（确定性、无随机试验）
+- voice_mapping 中配置的语言有较高的先验概率：证据不足时优先判为用户配置过的语言
+"""
+import os
+import re
+import html
+import json
+import math
+import threading
+import functools
+from array import array
+
+from langdetect.detector import Detector
+from langdetect.utils.ngram import NGram
+
+PROFILES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "vendor", "langdetect", "profiles"
+)
+
+# 与 langdetect 相同的平滑参数：每个 n-gram 的权重为 ALPHA / BASE_FREQ + p
+ALPHA = Detector.ALPHA_DEFAULT
+BASE_FREQ = Detector.BASE_FREQ
+# langdetect 置信度低于该阈值时不采用，使用文字系统降级规则
+# 注意：这里的概率是对全部 n-gram 的确定性后验，比 langdetect 多次随机试验的投票更“果断”：
+# 概率表本身偏向的短句（如 "Ciao come stai" -> pt）会直接被采用，而不是退回 en
+MIN_PROBABILITY = 0.75
+# langdetect 常把英文短词误判为这些语言（如 beautiful -> fr）
+SHORT_WORD_CONFUSIONS = ("fr", "ro", "it", "id", "pt", "es")
+# 已配置语言相对未配置语言的先验倍数（对数）：未配置语言的似然须高出约 5 倍才会胜出；
+# 再大会把葡萄牙语短句判成已配置的西班牙语，再小则更多英文短语被判成南非语等相近语言
+PREFERRED_PRIOR = math.log(5)
+
+TAG_RE = re.compile(r"<[^>]+>")
+NON_WORD_RE = re.compile(r"[0-9\W_]+")
+LATIN_WORD_RE = re.compile(r"[A-Za-z]+")
+# 单次扫描识别文字系统：分组名即对应的语言代码
+SCRIPT_RE = re.compile(
+    r"(?P<ko>[\uAC00-\uD7A3])"
+    r"|(?P<ja>[\u3040-\u30ff])"
+    r"|(?P<zh>[\u4e00-\u9fff])"
+    r"|(?P<ru>[\u0400-\u04FF])"
+    r"|(?P<ar>[\u0600-\u06FF])"
+    r"|(?P<hi>[\u0900-\u097F])"
+    r"|(?P<latin>[A-Za-z]+)"
+)
+
+def detect_scripts(text):
+    """返回文本中出现的文字系统集合"""
+    return {m.lastgroup for m in SCRIPT_RE.finditer(text)}
+
+_normalize_char = functools.lru_cache(maxsize=8192)(NGram.normalize)
+
+class NGramModel:
+    """
+    array 存储的稀疏 n-gram 对数概率表：每个 n-gram 只保存出现过它的语言
+    （starts[row] ~ starts[row + 1] 区间内的 cols / weights）。
+    log(平滑项 + p) = log(平滑项) + log1p(p / 平滑项)，前一项对所有语言相同、归一化时抵消，
+    所以只需累加 weights = log1p(p / 平滑项)；语言很多时比稠密表小得多、也快得多
+    """
+
+    def __init__(self, languages, preferred=(), profiles_dir=PROFILES_DIR):
+        self.languages = []
+        self.index = {}
+        self.starts = array("I", [0])
+        self.cols = array("H")
+        self.weights = array("d")
+        profiles = []
+        available = sorted(os.listdir(profiles_dir))
+        for lang in sorted(set(languages)):
+            # 语言代码为两位，zh 对应 zh-cn / zh-tw 两个概率表
+            for name in available:
+                if name == lang or name.startswith(lang + "-"):
+                    with open(os.path.join(profiles_dir, name), "r", encoding="utf-8") as f:
+                        profiles.append(json.load(f))
+                    self.languages.append(name)
+        preferred = set(preferred)
+        self.prior = [PREFERRED_PRIOR if name[:2] in preferred else 0.0 for name in self.languages]
+        self._build(profiles)
+
+    def _build(self, profiles):
+        if len(profiles) < 2:
+            return
+        smoothing = ALPHA / BASE_FREQ
+        entries = {}
+        for col, profile in enumerate(profiles):
+            n_words = profile["n_words"]
+            for word, freq in profile["freq"].items():
+                length = len(word)
+                if 1 <= length <= 3:
+                    weight = math.log1p(freq / n_words[length - 1] / smoothing)
+                    entries.setdefault(word, []).append((col, weight))
+
+        for row, (word, values) in enumerate(entries.items()):
+            self.index[word] = row
+            for col, weight in values:
+                self.cols.append(col)
+                self.weights.append(weight)
+            self.starts.append(len(self.cols))
+
+    def extract_ngrams(self, text):
+        """按 langdetect 的规则提取 1~3 gram（忽略全大写单词）"""
+        text = Detector.URL_RE.sub(" ", text)
+        text = Detector.MAIL_RE.sub(" ", text)
+        text = NGram.normalize_vi(text)
+        rows = []
+        grams = " "
+        capitalword = False
+        for ch in text:
+            ch = _normalize_char(ch)
+            last_char = grams[-1]
+            if last_char == " ":
+                grams = " "
+                capitalword = False
+                if ch == " ":
+                    continue
+            elif len(grams) >= NGram.N_GRAM:
+                grams = grams[1:]
+            grams += ch
+            if ch.isupper():
+                if last_char.isupper():
+                    capitalword = True
+            else:
+                capitalword = False
+            if capitalword:
+                continue
+            for n in (1, 2, 3):
+                if len(grams) < n:
+                    break
+                row = self.index.get(grams[-n:])
+                if row is not None:
+                    rows.append(row)
+        return rows
+
+    def detect(self, text):
+        """返回按概率降序排列的 [(语言, 概率)]；无可用特征时返回空列表"""
+        width = len(self.languages)
+        if width < 2:
+            return []
+        rows = self.extract_ngrams(text)
+        if not rows:
+            return []
+
+        starts, cols, weights = self.starts, self.cols, self.weights
+        scores = list(self.prior)
+        for row in rows:
+            for i in range(starts[row], starts[row + 1]):
+                scores[cols[i]] += weights[i]
+
+        best = max(scores)
+        likelihoods = [math.exp(s - best) for s in scores]
+        total = sum(likelihoods)
+        return sorted(
+            ((lang, w / total) for lang, w in zip(self.languages, likelihoods)),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+class LanguageDetector:
+    """
+    带记忆化的语言检测：languages 为需要区分的语言（voice_mapping 的键与语音目录中的语言），
+    preferred 为用户配置过的语言（通常取 voice_mapping 的键），有较高的先验概率
+    """
+
+    def __init__(self, languages, preferred=(), cache_size=4096):
+        # 中日韩由文字系统直接判断，无需加载概率表
+        self.languages = tuple(sorted(set(languages) - {"zh", "ja", "ko"}))
+        self.preferred = frozenset(preferred)
+        self._model = None
+        self._lock = threading.Lock()
+        self.detect_clean = functools.lru_cache(maxsize=cache_size)(self._detect_clean)
+
+    @property
+    def model(self):
+        # 首次需要时才加载概率表
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = NGramModel(self.languages, self.preferred)
+        return self._model
+
+    def detect(self, text):
+        """
+        更稳健的语言检测：
+        - CJK（中/日/韩）优先检测（独立于 langdetect）
+        - langdetect 概率表仅作为辅助，并增加概率阈值/短文本特殊规则
+        - 修复英文单词被判成法语的问题（如：beautiful -> fr）
+        """
+        clean = NON_WORD_RE.sub(" ", html.unescape(TAG_RE.sub("", text))).strip()
+        if not clean:
+            return "en"
+        return self.detect_clean(" ".join(clean.split()))
+
+    def _detect_clean(self, clean):
+        scripts = detect_scripts(clean)
+
+        # ① CJK 绝对优先
+        for lang in ("ko", "ja", "zh"):
+            if lang in scripts:
+                return lang
+
+        # ② 单个英文短词 → 视为英文
+        is_latin_word = LATIN_WORD_RE.fullmatch(clean) is not None
+        if len(clean) <= 8 and is_latin_word:
+            return "en"
+
+        # ③ n-gram 概率表主检测
+        ranked = self.model.detect(clean)
+        if ranked:
+            lang, prob = ranked[0]
+            if lang in SHORT_WORD_CONFUSIONS and len(clean) <= 12 and is_latin_word:
+                return "en"
+            if prob >= MIN_PROBABILITY:
+                return lang[:2]
+
+        # ④ 降级字符系判断，⑤ 默认英文
+        for lang in ("ru", "ar", "hi"):
+            if lang in scripts:
+                return lang
+        return "en"
@@ -0,0 +1,438 @@
+# file engine.py
+"""
+常驻的语音合成引擎：
+- 一个后台线程运行长期存在的事件循环，所有合成请求都提交到这里执行
+- 共享一个 aiohttp 会话（TCPConnector）和只创建一次的 SSL 上下文
+- websocket 连接池：一条连接上依次发送多轮 speech.config / SSML 请求，
+  省去每次请求的 TCP + TLS + websocket 握手
+- 音频先写入缓冲 / 临时文件，成功后才原子地发布到媒体目录
+- 每轮请求都经过自适应限流器（令牌桶 + AIMD 并发 + 熔断，见 ratelimit.py）
+协议细节与 edge_tts.Communicate 保持一致，复用其中的 SSML 与消息解析函数。
+"""
+import ssl
+import json
+import time
+import asyncio
+import threading
+import concurrent.futures
+from xml.sax.saxutils import escape, unescape
+
+import aiohttp
+import certifi
+from edge_tts.communicate import (
+    connect_id,
+    date_to_string,
+    get_headers_and_data,
+    mkssml,
+    remove_incompatible_characters,
+    split_text_by_byte_length,
+    ssml_headers_plus_data,
+)
+from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL
+from edge_tts.data_classes import TTSConfig
+from edge_tts.drm import DRM
+from edge_tts.exceptions import (
+    NoAudioReceived,
+    UnexpectedResponse,
+    UnknownResponse,
+    WebSocketError,
+)
+
+from .packing import (
+    PACK_MAX_BYTES,
+    PackingError,
+    cut_points,
+    packed_ssml_text,
+    split_mp3,
+    utterance_spans,
+)
+from .ratelimit import AdaptiveLimiter
+from .storage import AtomicWriter
+from . import perf
+
+# 连接池中最多保留的空闲连接数，以及空闲连接的最长复用时间（秒）
+POOL_SIZE = 8
+IDLE_TIMEOUT = 30.0
+
+class ConnectionClosed(ConnectionError):
+    """服务器在一轮请求结束前关闭了 websocket"""
+
+class _Connection:
+    """连接池中的一条 websocket 连接"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.boundary = None  # 该连接上已发送的 speech.config 对应的边界类型
+        self.last_used = time.monotonic()
+
+    @property
+    def closed(self):
+        return self.ws.closed
+
+    async def close(self):
+        if not self.ws.closed:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+
+class SynthesisEngine:
+    """常驻合成引擎；submit / run 可在任意线程调用"""
+
+    def __init__(self, wss_url=WSS_URL, pool_size=POOL_SIZE, idle_timeout=IDLE_TIMEOUT,
+                 connect_timeout=10, receive_timeout=60, proxy=None, media_index=None,
+                 limiter=None):
+        # wss_url 可替换为本地的模拟服务器，便于离线测试
+        # media_index 用于按内容哈希合并重复文件（见 storage.MediaContentIndex）
+        # limiter 为 ratelimit.AdaptiveLimiter，所有请求共享
+        self.wss_url = wss_url
+        self.media_index = media_index
+        self.limiter = limiter if limiter is not None else AdaptiveLimiter()
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.receive_timeout = receive_timeout
+        self.proxy = proxy
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._ssl_ctx = None
+        self._idle = []
+        self._lock = threading.Lock()
+
+    # ------------------ 线程与事件循环 ------------------
+
+    def start(self):
+        """启动后台事件循环（已启动时直接返回）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._run_loop, name="edge-tts-engine", daemon=True
+            )
+            self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+            # 停止后取消仍未完成的任务，使对应的 Future 被取消而不是永远等待
+            self._loop.run_until_complete(self._cancel_pending())
+            self._loop.run_until_complete(self._close_all())
+        finally:
+            self._loop.close()
+
+    @staticmethod
+    async def _cancel_pending():
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, coro):
+        """把协程提交到引擎线程，返回 concurrent.futures.Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout=None):
+        """
+        提交协程并阻塞等待结果（不要在引擎线程内调用）
+        超时抛出 TimeoutError 并取消任务；引擎关闭时抛出 concurrent.futures.CancelledError
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self, timeout=5):
+        """取消未完成的任务、关闭所有连接并停止后台线程"""
+        with self._lock:
+            thread, loop = self._thread, self._loop
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+
+    # ------------------ 会话与连接池 ------------------
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            if self._ssl_ctx is None:
+                self._ssl_ctx = ssl.create_default_context(cafile=certifi.where())
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0, ttl_dns_cache=300),
+                trust_env=True,
+                trace_configs=[self._connection_trace()],
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    connect=None,
+                    sock_connect=self.connect_timeout,
+                    sock_read=self.receive_timeout,
+                ),
+            )
+        return self._session
+
+    @staticmethod
+    def _connection_trace():
+        """记录 TCP + TLS 建连耗时（不含 websocket 握手）"""
+        async def on_start(session, context, params):
+            context.connect_start = time.perf_counter()
+
+        async def on_end(session, context, params):
+            perf.record("tcp_tls_connect", time.perf_counter() - context.connect_start)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_start.append(on_start)
+        trace.on_connection_create_end.append(on_end)
+        return trace
+
+    async def _ws_connect(self):
+        session = self._get_session()
+        with perf.span("drm_token"):
+            sec_ms_gec = DRM.generate_sec_ms_gec()
+        return await session.ws_connect(
+            f"{self.wss_url}&Sec-MS-GEC={sec_ms_gec}"
+            f"&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}"
+            f"&ConnectionId={connect_id()}",
+            compress=15,
+            proxy=self.proxy,
+            headers=WSS_HEADERS,
+            ssl=self._ssl_ctx if self.wss_url.startswith("wss:") else True,
+            # 会话的 sock_read 只作用于握手：升级为 websocket 后 aiohttp 会清除读超时，
+            # 必须在这里单独指定，否则服务端停止响应时一轮请求会永远等待
+            timeout=aiohttp.ClientWSTimeout(ws_receive=self.receive_timeout, ws_close=10.0),
+        )
+
+    async def _connect(self):
+        """新建连接；403 时按服务器时间校正时钟偏差后重试一次"""
+        with perf.span("ws_connect"):
+            try:
+                ws = await self._ws_connect()
+            except aiohttp.ClientResponseError as e:
+                if e.status != 403:
+                    raise
+                DRM.handle_client_response_error(e)
+                ws = await self._ws_connect()
+        return _Connection(ws)
+
+    async def _acquire(self):
+        """取一条空闲连接，返回 (连接, 是否为复用连接)"""
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.closed and time.monotonic() - conn.last_used < self.idle_timeout:
+                return conn, True
+            await conn.close()
+        return await self._connect(), False
+
+    async def _release(self, conn):
+        conn.last_used = time.monotonic()
+        if conn.closed or len(self._idle) >= self.pool_size:
+            await conn.close()
+        else:
+            self._idle.append(conn)
+
+    async def _close_all(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ------------------ 协议 ------------------
+
+    async def _send_command_request(self, conn, boundary):
+        word_boundary = boundary == "WordBoundary"
+        wd = "true" if word_boundary else "false"
+        sq = "true" if not word_boundary else "false"
+        await conn.ws.send_str(
+            f"X-Timestamp:{date_to_string()}\r\n"
+            "Content-Type:application/json; charset=utf-8\r\n"
+            "Path:speech.config\r\n\r\n"
+            '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+            f'"sentenceBoundaryEnabled":"{sq}","wordBoundaryEnabled":"{wd}"'
+            "},"
+            '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"'
+            "}}}}\r\n"
+        )
+        conn.boundary = boundary
+
+    @staticmethod
+    def _parse_metadata(data, state):
+        for meta_obj in json.loads(data)["Metadata"]:
+            meta_type = meta_obj["Type"]
+            if meta_type in ("WordBoundary", "SentenceBoundary"):
+                return {
+                    "type": meta_type,
+                    "offset": meta_obj["Data"]["Offset"] + state["offset_compensation"],
+                    "duration": meta_obj["Data"]["Duration"],
+                    "text": unescape(meta_obj["Data"]["text"]["Text"]),
+                }
+            if meta_type in ("SessionEnd",):
+                continue
+            raise UnknownResponse(f"Unknown metadata type: {meta_type}")
+        raise UnexpectedResponse("No WordBoundary metadata found")
+
+    async def _turn(self, conn, tts_config, escaped_text, state):
+        """在一条连接上完成一轮请求，逐条产出音频与边界元数据"""
+        if conn.boundary != tts_config.boundary:
+            await self._send_command_request(conn, tts_config.boundary)
+        await conn.ws.send_str(
+            ssml_headers_plus_data(
+                connect_id(), date_to_string(), mkssml(tts_config, escaped_text)
+            )
+        )
+
+        async for received in conn.ws:
+            if received.type == aiohttp.WSMsgType.TEXT:
+                encoded_data = received.data.encode("utf-8")
+                parameters, data = get_headers_and_data(
+                    encoded_data, encoded_data.find(b"\r\n\r\n")
+                )
+                path = parameters.get(b"Path", None)
+                if path == b"audio.metadata":
+                    metadata = self._parse_metadata(data, state)
+                    yield metadata
+                    state["last_duration_offset"] = metadata["offset"] + metadata["duration"]
+                elif path == b"turn.end":
+                    # 与 edge_tts 相同：用服务端平均尾部填充补偿下一段的偏移
+                    state["offset_compensation"] = state["last_duration_offset"] + 8_750_000
+                    return
+                elif path not in (b"response", b"turn.start"):
+                    raise UnknownResponse("Unknown path received")
+            elif received.type == aiohttp.WSMsgType.BINARY:
+                if len(received.data) < 2:
+                    raise UnexpectedResponse(
+                        "We received a binary message, but it is missing the header length."
+                    )
+                header_length = int.from_bytes(received.data[:2], "big")
+                if header_length > len(received.data):
+                    raise UnexpectedResponse(
+                        "The header length is greater than the length of the data."
+                    )
+                parameters, data = get_headers_and_data(received.data, header_length)
+                if parameters.get(b"Path") != b"audio":
+                    raise UnexpectedResponse(
+                        "Received binary message, but the path is not audio."
+                    )
+                content_type = parameters.get(b"Content-Type", None)
+                if content_type not in (b"audio/mpeg", None):
+                    raise UnexpectedResponse(
+                        "Received binary message, but with an unexpected Content-Type."
+                    )
+                if content_type is None:
+                    if len(data) == 0:
+                        continue
+                    raise UnexpectedResponse(
+                        "Received binary message with no Content-Type, but with data."
+                    )
+                if len(data) == 0:
+                    raise UnexpectedResponse(
+                        "Received binary message, but it is missing the audio data."
+                    )
+                yield {"type": "audio", "data": data}
+            elif received.type == aiohttp.WSMsgType.ERROR:
+                raise WebSocketError(received.data if received.data else "Unknown error")
+
+        raise ConnectionClosed("websocket closed before turn.end")
+
+    async def _stream_turn(self, tts_config, escaped_text, state):
+        async with self.limiter.slot():
+            with perf.span("acquire_connection") as fields:
+                conn, reused = await self._acquire()
+                fields["reused"] = reused
+            yielded = False
+            try:
+                try:
+                    async for message in self._turn(conn, tts_config, escaped_text, state):
+                        yielded = True
+                        yield message
+                except (aiohttp.ClientError, ConnectionError):
+                    # 复用的空闲连接可能已被服务器关闭：尚未产出数据时换新连接重试一次
+                    if not reused or yielded:
+                        raise
+                    await conn.close()
+                    conn = await self._connect()
+                    async for message in self._turn(conn, tts_config, escaped_text, state):
+                        yield message
+            except BaseException:
+                await conn.close()
+                raise
+            await self._release(conn)
+
+    async def stream(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz",
+                     boundary="SentenceBoundary"):
+        """流式合成（必须在引擎线程中运行），产出格式与 Communicate.stream 相同"""
+        tts_config = TTSConfig(voice, rate, volume, pitch, boundary)
+        state = {"offset_compensation": 0, "last_duration_offset": 0}
+        start = time.perf_counter()
+        received_bytes = 0
+        for escaped_text in split_text_by_byte_length(
+            escape(remove_incompatible_characters(text)), 4096
+        ):
+            async for message in self._stream_turn(tts_config, escaped_text, state):
+                if message["type"] == "audio":
+                    if not received_bytes:
+                        perf.record("first_audio_byte", time.perf_counter() - start)
+                    received_bytes += len(message["data"])
+                yield message
+        if not received_bytes:
+            raise NoAudioReceived(
+                "No audio was received. Please verify that your parameters are correct."
+            )
+        perf.record("synthesis", time.perf_counter() - start, bytes=received_bytes)
+
+    async def synthesize(self, text, voice, rate, volume, output_filename, dedupe=True):
+        """
+        合成并原子地写入文件，返回最终文件路径
+        （与已有媒体文件内容完全相同时返回已有文件的路径；
+        dedupe=False 时不查重，用于媒体目录之外自行管理的文件）
+        """
+        with AtomicWriter(output_filename, self.media_index if dedupe else None) as writer:
+            async for message in self.stream(text, voice, rate=rate, volume=volume):
+                if message["type"] == "audio":
+                    writer.write(message["data"])
+            with perf.span("file_publish"):
+                return writer.commit()
+
+    async def synthesize_packed(self, texts, voice, rate, volume, output_filenames):
+        """
+        把多条短文本合并为一次请求合成，再按 WordBoundary 切分写入各自的文件
+        无法可靠切分时抛出 PackingError（调用方应退回逐条合成）；返回各文件的最终路径
+        """
+        escaped_text, plain = packed_ssml_text(texts)
+        if len(escaped_text.encode("utf-8")) > PACK_MAX_BYTES:
+            raise PackingError("合并后的文本超过单次请求上限")
+
+        tts_config = TTSConfig(voice, rate, volume, "+0Hz", "WordBoundary")
+        state = {"offset_compensation": 0, "last_duration_offset": 0}
+        start = time.perf_counter()
+        audio = bytearray()
+        boundaries = []
+        async for message in self._stream_turn(tts_config, escaped_text, state):
+            if message["type"] == "audio":
+                if not audio:
+                    perf.record("first_audio_byte", time.perf_counter() - start)
+                audio += message["data"]
+            else:
+                boundaries.append(message)
+        if not audio:
+            raise NoAudioReceived(
+                "No audio was received. Please verify that your parameters are correct."
+            )
+        perf.record("synthesis_packed", time.perf_counter() - start, bytes=len(audio), texts=len(texts))
+
+        spans = utterance_spans(plain, boundaries)
+        pieces = split_mp3(bytes(audio), cut_points(spans))
+        paths = []
+        for output_filename, piece in zip(output_filenames, pieces):
+            with AtomicWriter(output_filename, self.media_index) as writer:
+                writer.write(piece)
+                with perf.span("file_publish"):
+                    paths.append(writer.commit())
+        return paths
@@ -0,0 +1,133 @@
+# file packing.py
+"""
+多条短文本合并为一次请求：
+- 把多张卡片的文本用 <break> 连接成一段 SSML（不超过 4096 字节的单次请求上限）
+- 根据服务端返回的 WordBoundary 偏移，确定每条文本在音频中的时间范围
+- 在两条文本之间停顿的中点、按 MP3 帧边界把音频切回每张卡片各自的文件
+"""
+import bisect
+from xml.sax.saxutils import escape
+
+from edge_tts.communicate import remove_incompatible_characters
+
+# 单次 SSML 请求的文本上限（与 edge_tts 的 split_text_by_byte_length 一致）
+PACK_MAX_BYTES = 4096
+# 文本之间插入的停顿，切分点落在停顿中间
+PACK_BREAK_MS = 400
+BREAK_TAG = f"<break time='{PACK_BREAK_MS}ms'/>"
+# 偏移量单位为 100 纳秒
+TICKS_PER_SECOND = 10_000_000
+
+class PackingError(Exception):
+    """无法把合并请求的音频可靠地切分回各条文本"""
+
+def packed_ssml_text(texts):
+    """返回 (已转义的 SSML 正文, 清理后的原文列表)"""
+    plain = [remove_incompatible_characters(text) for text in texts]
+    return BREAK_TAG.join(escape(text) for text in plain), plain
+
+def packed_size(texts):
+    """合并后 SSML 正文的字节数"""
+    return len(packed_ssml_text(texts)[0].encode("utf-8"))
+
+def utterance_spans(texts, boundaries):
+    """
+    把 WordBoundary 分配到各条文本，返回每条文本的 (开始, 结束) 偏移
+    boundaries 为按顺序的 {"offset", "duration", "text"}；任何一条文本没有
+    匹配到单词时抛出 PackingError
+    """
+    starts = []
+    joined = ""
+    for text in texts:
+        starts.append(len(joined))
+        joined += text + "\n"
+
+    spans = [None] * len(texts)
+    cursor = 0
+    for boundary in boundaries:
+        word = boundary["text"]
+        index = joined.find(word, cursor) if word else -1
+        if index < 0:
+            continue
+        cursor = index + len(word)
+        utterance = bisect.bisect_right(starts, index) - 1
+        start = boundary["offset"]
+        end = start + boundary["duration"]
+        if spans[utterance] is None:
+            spans[utterance] = [start, end]
+        else:
+            spans[utterance][1] = max(spans[utterance][1], end)
+
+    if any(span is None for span in spans):
+        raise PackingError("部分文本没有对应的 WordBoundary，无法切分")
+    return [tuple(span) for span in spans]
+
+def cut_points(spans):
+    """相邻两条文本之间停顿的中点（秒）"""
+    return [
+        (spans[i][1] + spans[i + 1][0]) / 2 / TICKS_PER_SECOND
+        for i in range(len(spans) - 1)
+    ]
+
+# ------------------ MP3 帧解析 ------------------
+
+# Layer III 比特率表（kbps）：MPEG-1 与 MPEG-2/2.5
+_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+def _parse_frame_header(data, pos):
+    """解析 pos 处的 Layer III 帧头，返回 (帧长度, 帧时长秒)；不是合法帧头时返回 None"""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    sample_rate_index = (data[pos + 2] >> 2) & 0x03
+    padding = (data[pos + 2] >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    if version == 3:
+        bitrate = _BITRATES_V1[bitrate_index] * 1000
+        samples = 1152
+    else:
+        bitrate = _BITRATES_V2[bitrate_index] * 1000
+        samples = 576
+    length = samples // 8 * bitrate // sample_rate + padding
+    return length, samples / sample_rate
+
+def iter_mp3_frames(data):
+    """依次产出 (起始位置, 帧长度, 帧时长秒)，遇到无法识别的字节时向后重新同步"""
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = 0
+        for byte in data[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        pos = 10 + size
+    while pos < len(data):
+        header = _parse_frame_header(data, pos)
+        if header is None or pos + header[0] > len(data):
+            pos += 1
+            continue
+        yield pos, header[0], header[1]
+        pos += header[0]
+
+def split_mp3(data, cuts):
+    """按时间点（秒）在帧边界处切分 MP3，返回 len(cuts) + 1 段字节串"""
+    pieces = [bytearray() for _ in range(len(cuts) + 1)]
+    piece = 0
+    elapsed = 0.0
+    for pos, length, duration in iter_mp3_frames(data):
+        while piece < len(cuts) and elapsed >= cuts[piece]:
+            piece += 1
+        pieces[piece] += data[pos:pos + length]
+        elapsed += duration
+    if any(not piece_data for piece_data in pieces):
+        raise PackingError("切分后存在空的音频片段")
+    return [bytes(piece_data) for piece_data in pieces]
@@ -0,0 +1,136 @@
+# file perf.py
+"""
+轻量的性能计时：
+- span() 记录一段代码的耗时，record() 直接记录一条数据
+- 最近的记录保存在环形缓冲区中，summary() 汇总各阶段的 p50 / p95
+- 可选：记录追加写入 JSONL 跟踪文件，便于离线分析。record() 也在合成引擎的事件循环线程中调用，
+  所以只把记录放入缓冲，由后台线程按批（约每秒一次或攒满一批时）写入文件
+"""
+import json
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# 环形缓冲区保留的记录条数
+RING_SIZE = 5000
+# 跟踪文件的写入间隔（秒）；缓冲达到该条数时提前写入
+TRACE_FLUSH_INTERVAL = 1.0
+TRACE_BATCH_SIZE = 200
+
+_records = deque(maxlen=RING_SIZE)
+_lock = threading.Lock()
+_trace_path = None
+# 尚未写入跟踪文件的记录；_write_lock 保证各批按顺序写入
+_trace_buffer = []
+_trace_wakeup = threading.Event()
+_trace_writer = None
+_write_lock = threading.Lock()
+
+def set_trace_path(path):
+    """设置 JSONL 跟踪文件路径，None 表示不写文件；已缓冲的记录写入原来的文件"""
+    global _trace_path, _trace_writer
+    with _write_lock:
+        with _lock:
+            batch, old_path = _take_buffer()
+            _trace_path = path
+            if path is not None and _trace_writer is None:
+                _trace_writer = threading.Thread(
+                    target=_write_loop, name="edge-tts-perf-trace", daemon=True
+                )
+                _trace_writer.start()
+            elif path is None:
+                # 让后台线程立即退出
+                _trace_wakeup.set()
+        _write(old_path, batch)
+
+def record(name, seconds, **fields):
+    """记录一条耗时数据（秒），fields 为附加信息（如字节数、是否命中）"""
+    entry = {"name": name, "ms": round(seconds * 1000, 3), "ts": time.time()}
+    entry.update(fields)
+    with _lock:
+        _records.append(entry)
+        if _trace_path is not None:
+            _trace_buffer.append(entry)
+            if len(_trace_buffer) >= TRACE_BATCH_SIZE:
+                _trace_wakeup.set()
+
+def flush():
+    """立即把缓冲的记录写入跟踪文件（关闭配置文件时调用，避免丢失最后一批）"""
+    with _write_lock:
+        with _lock:
+            batch, path = _take_buffer()
+        _write(path, batch)
+
+def _take_buffer():
+    # 调用方持有 _lock
+    batch = _trace_buffer[:]
+    del _trace_buffer[:]
+    return batch, _trace_path
+
+def _write(path, batch):
+    if path is None or not batch:
+        return
+    lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch)
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+    except OSError:
+        pass
+
+def _write_loop():
+    """后台写入线程：关闭跟踪且缓冲已写完时退出"""
+    global _trace_writer
+    while True:
+        _trace_wakeup.wait(TRACE_FLUSH_INTERVAL)
+        _trace_wakeup.clear()
+        flush()
+        with _lock:
+            if _trace_path is None and not _trace_buffer:
+                _trace_writer = None
+                return
+
+@contextmanager
+def span(name, **fields):
+    """计时上下文：with span("detect_language"): ..."""
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(name, time.perf_counter() - start, **fields)
+
+def percentile(values, q):
+    """最近秩法百分位数；values 须已排序"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))
+    return values[index]
+
+def summary():
+    """按阶段汇总：次数、p50、p95、最大值（毫秒）以及累计字节数与命中率"""
+    with _lock:
+        records = list(_records)
+    groups = {}
+    for entry in records:
+        groups.setdefault(entry["name"], []).append(entry)
+
+    rows = []
+    for name, entries in groups.items():
+        values = sorted(entry["ms"] for entry in entries)
+        row = {
+            "name": name,
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": values[-1],
+            "bytes": sum(entry.get("bytes", 0) for entry in entries),
+        }
+        hits = [entry["hit"] for entry in entries if "hit" in entry]
+        row["hit_rate"] = sum(hits) / len(hits) if hits else None
+        rows.append(row)
+    return rows
+
+def clear():
+    with _lock:
+        _records.clear()
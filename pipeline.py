@@ -0,0 +1,143 @@
+# file pipeline.py
+"""
+批量合成流水线（不依赖 Anki，可在本地模拟服务器上测试）：
+- 有界并发 + 队列背压，403 / 网络错误按退避策略重试
+- 短文本合并为一次请求；合并请求失败时退回逐条合成
+"""
+import asyncio
+
+import aiohttp
+from edge_tts.drm import DRM
+from edge_tts.exceptions import SkewAdjustmentError
+
+from .packing import PACK_MAX_BYTES, packed_size
+from .ratelimit import is_retryable, retry_delay
+
+# 合并请求中最多包含的文本条数
+PACK_MAX_MEMBERS = 50
+
+async def call_with_retry(make_call, max_retries):
+    """
+    执行 make_call() 返回的协程，失败时按退避策略重试
+    返回 (结果, None)；最终失败时返回 (None, 最后的异常)
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return await make_call(), None
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                return None, e
+            if isinstance(e, aiohttp.ClientResponseError) and e.status == 403:
+                # 根据服务器时间校正时钟偏差后再重试
+                try:
+                    DRM.handle_client_response_error(e)
+                except SkewAdjustmentError:
+                    pass
+            await asyncio.sleep(retry_delay(attempt))
+
+async def synthesize_with_retry(job, synthesize, max_retries):
+    """合成单个任务（带重试）；成功时 job["path"] 更新为最终文件路径"""
+    path, error = await call_with_retry(
+        lambda: synthesize(job["text"], job["voice"], job["rate"], job["volume"], job["path"]),
+        max_retries,
+    )
+    if error is None and path:
+        job["path"] = path
+    return error
+
+async def process_job(job, synthesize, synthesize_packed, max_retries):
+    """执行单个任务或合并任务，返回 [(job, error)]"""
+    members = job.get("members")
+    if members is None:
+        return [(job, await synthesize_with_retry(job, synthesize, max_retries))]
+
+    paths, error = await call_with_retry(
+        lambda: synthesize_packed(
+            [member["text"] for member in members],
+            job["voice"], job["rate"], job["volume"],
+            [member["path"] for member in members],
+        ),
+        max_retries,
+    )
+    if error is None:
+        for member, path in zip(members, paths or ()):
+            member["path"] = path
+        return [(member, None) for member in members]
+
+    # 合并请求失败或无法切分：退回逐条合成
+    return [
+        (member, await synthesize_with_retry(member, synthesize, max_retries))
+        for member in members
+    ]
+
+async def run_pipeline_async(jobs, synthesize, synthesize_packed=None, concurrency=4,
+                             max_retries=3, on_result=None, cancel_event=None):
+    """
+    有界并发执行合成任务：
+    - 队列容量为并发数的两倍，生产者在队列满时等待（背压）
+    - 带 members 的合并任务通过 synthesize_packed 一次请求合成多条文本
+    - on_result(job, error) 在每条文本结束后调用，error 为 None 表示成功
+    """
+    concurrency = max(1, int(concurrency))
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    # total 与 done / failed 一样按文本计数（合并任务计其中的每一条）
+    stats = {"total": sum(len(job.get("members", (job,))) for job in jobs), "done": 0, "failed": 0}
+
+    async def producer():
+        for job in jobs:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            await queue.put(job)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            if cancel_event is not None and cancel_event.is_set():
+                continue
+            for member, error in await process_job(job, synthesize, synthesize_packed, max_retries):
+                if error is None:
+                    stats["done"] += 1
+                else:
+                    stats["failed"] += 1
+                if on_result is not None:
+                    on_result(member, error)
+
+    await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+    return stats
+
+def pack_jobs(jobs, max_chars, max_members=PACK_MAX_MEMBERS):
+    """
+    把短文本任务按 (语音, 语速, 音量) 合并为一次请求；
+    合并后的 SSML 正文不超过单次请求上限，单个合并任务最多 max_members 条
+    """
+    packed = []
+    open_packs = {}
+    for job in jobs:
+        if len(job["text"]) > max_chars:
+            packed.append(job)
+            continue
+        settings = (job["voice"], job["rate"], job["volume"])
+        pack = open_packs.get(settings)
+        if pack is not None:
+            texts = [member["text"] for member in pack["members"]] + [job["text"]]
+            if len(pack["members"]) >= max_members or packed_size(texts) > PACK_MAX_BYTES:
+                pack = None
+        if pack is None:
+            pack = open_packs[settings] = {
+                "members": [],
+                "voice": job["voice"],
+                "rate": job["rate"],
+                "volume": job["volume"],
+            }
+            packed.append(pack)
+        pack["members"].append(job)
+
+    # 只有一条文本的合并任务还原为普通任务
+    return [
+        job["members"][0] if "members" in job and len(job["members"]) == 1 else job
+        for job in packed
+    ]
@@ -0,0 +1,207 @@
+# file ratelimit.py
+"""
+Edge 服务端的自适应限流：
+- 令牌桶限制请求速率
+- AIMD 调整并发上限：成功时缓慢增加，遇到 403 / 429 / 503 / 超时时减半
+- 熔断器：连续被限流时暂停所有请求，冷却后放行一个探测请求，成功即恢复
+- 指数退避 + 全抖动的重试间隔
+所有方法都应在同一个事件循环（合成引擎线程）中调用。
+"""
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiohttp
+from edge_tts.exceptions import NoAudioReceived, WebSocketError
+
+# 被视为服务端限流的 HTTP 状态码
+THROTTLE_STATUSES = (403, 429, 503)
+# 可重试的 HTTP 状态码（403 通常是时钟偏差导致的 Sec-MS-GEC 失效）
+RETRY_STATUSES = (403, 429, 500, 502, 503, 504)
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+OK = "ok"
+THROTTLED = "throttled"
+FAILED = "failed"
+
+def classify(e):
+    """把异常归类为 THROTTLED（需要降速）或 FAILED（与限流无关的错误）"""
+    if isinstance(e, aiohttp.ClientResponseError) and e.status in THROTTLE_STATUSES:
+        return THROTTLED
+    if isinstance(e, asyncio.TimeoutError):
+        return THROTTLED
+    return FAILED
+
+def is_retryable(e):
+    """判断异常是否为可重试的临时错误"""
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status in RETRY_STATUSES
+    return isinstance(e, (
+        aiohttp.ClientError,
+        asyncio.TimeoutError,
+        ConnectionError,
+        WebSocketError,
+        NoAudioReceived,
+    ))
+
+def retry_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """指数退避 + 全抖动：在 [0, min(cap, base * 2^attempt)] 内均匀取值"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class AdaptiveLimiter:
+    """令牌桶 + AIMD 并发控制 + 熔断器"""
+
+    def __init__(self, rate=5.0, burst=5, max_concurrency=8, min_concurrency=1,
+                 trip_after=3, cooldown=5.0, max_cooldown=120.0):
+        # rate: 每秒请求数上限；burst: 令牌桶容量
+        # trip_after: 连续多少次限流后熔断；cooldown: 首次熔断的暂停时长（秒），之后逐次翻倍
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.trip_after = trip_after
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.tokens = self.burst
+        self.consecutive_throttles = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.probing = False
+        # 每次熔断加 1：熔断前就已发出的请求，其成功不能关闭熔断器
+        self.generation = 0
+        self.stats = {OK: 0, THROTTLED: 0, FAILED: 0, "trips": 0}
+
+        self._last_refill = time.monotonic()
+        self._event = None
+        self._loop = None
+
+    # ------------------ 状态 ------------------
+
+    @property
+    def is_open(self):
+        """熔断中（暂停发送请求）"""
+        return time.monotonic() < self.open_until
+
+    @property
+    def resume_in(self):
+        """距离熔断恢复的秒数"""
+        return max(0.0, self.open_until - time.monotonic())
+
+    def _get_event(self):
+        # Event 必须在运行中的事件循环里创建（引擎重启后事件循环会变化）
+        loop = asyncio.get_running_loop()
+        if self._event is None or self._loop is not loop:
+            self._event = asyncio.Event()
+            self._loop = loop
+        return self._event
+
+    def _notify(self):
+        # 唤醒所有等待者，之后的等待者使用新的 Event
+        if self._event is not None:
+            event, self._event = self._event, None
+            event.set()
+
+    # ------------------ 令牌桶 ------------------
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def _take_token(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    # ------------------ 获取 / 释放 ------------------
+
+    @property
+    def half_open(self):
+        """冷却结束、等待探测请求的结果"""
+        return bool(self.open_until) and not self.is_open
+
+    def _can_start(self):
+        if self.is_open:
+            return False
+        if self.half_open:
+            # 半开状态：只放行一个探测请求
+            return not self.probing and self.in_flight == 0
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self):
+        """等待并发名额与令牌，返回获取时的熔断代数（传给 release）"""
+        while not self._can_start():
+            event = self._get_event()
+            try:
+                await asyncio.wait_for(event.wait(), self.resume_in if self.is_open else None)
+            except asyncio.TimeoutError:
+                pass
+        # 先占用并发名额（探测名额）再等待令牌；等待令牌时被取消必须归还，
+        # 否则并发上限降到 1 后所有请求都会卡住，半开状态也不会再放行探测
+        probe = self.half_open
+        self.in_flight += 1
+        if probe:
+            self.probing = True
+        try:
+            await self._take_token()
+        except BaseException:
+            self.in_flight -= 1
+            if probe:
+                self.probing = False
+            self._notify()
+            raise
+        return self.generation
+
+    def release(self, outcome, generation=None):
+        """generation 为 acquire 的返回值；省略时视为当前代"""
+        self.in_flight -= 1
+        self.stats[outcome] += 1
+        if outcome == THROTTLED:
+            self._on_throttled()
+        elif outcome == OK and (generation is None or generation == self.generation):
+            # 熔断之前发出的请求（如复用连接上的请求）成功不代表服务端已恢复
+            self._on_success()
+        self.probing = False
+        self._notify()
+
+    def _on_success(self):
+        # 加性增：每成功一个“窗口”（约 limit 个请求）并发上限 +1
+        self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+        self.consecutive_throttles = 0
+        self.cooldown = self.base_cooldown
+        self.open_until = 0.0
+
+    def _on_throttled(self):
+        # 乘性减：并发上限减半，同时丢弃积攒的令牌
+        self.limit = max(self.min_concurrency, self.limit / 2)
+        self.tokens = 0.0
+        self.consecutive_throttles += 1
+        if self.consecutive_throttles >= self.trip_after and not self.is_open:
+            self.open_until = time.monotonic() + self.cooldown * random.uniform(0.8, 1.2)
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            self.generation += 1
+            self.stats["trips"] += 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """async with limiter.slot(): ...  —— 按异常类型自动反馈结果"""
+        generation = await self.acquire()
+        try:
+            yield
+        except Exception as e:
+            self.release(classify(e), generation)
+            raise
+        except BaseException:
+            # 取消、生成器关闭等
+            self.release(FAILED, generation)
+            raise
+        else:
+            self.release(OK, generation)
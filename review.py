@@ -0,0 +1,167 @@
+# file review.py
+"""
+复习时即时合成（review_tts 开启时）：
+- 显示问题时为当前卡片合成语音，命中缓存时立即播放
+- 在后台预取调度队列中接下来的 N 张卡片（review_prefetch）
+- 音频保存在插件目录的 review_cache 中，不写入媒体文件夹、不参与同步；
+  总大小超过 review_cache_mb 时按最近最少使用淘汰，并删除对应文件
+"""
+import os
+import re
+import concurrent.futures
+
+from aqt import mw
+from aqt.sound import av_player
+from aqt.utils import tooltip
+
+from . import (
+    ADDON_ROOT,
+    get_config,
+    get_engine,
+    resolve_voice,
+    speech_cache_key,
+    strip_html_tags,
+)
+from .cache import TTSCache
+from . import perf
+
+REVIEW_CACHE_DIR = os.path.join(ADDON_ROOT, "review_cache")
+SOUND_TAG_RE = re.compile(r"\[sound:[^\]]*\]")
+
+_cache = None
+# 正在合成的任务：缓存键 -> Future（当前卡片与预取共用，避免重复请求）
+_pending = {}
+
+def _delete_file(filename):
+    try:
+        os.remove(os.path.join(REVIEW_CACHE_DIR, filename))
+    except FileNotFoundError:
+        pass
+
+def get_review_cache():
+    """复习语音缓存索引；修改 review_cache_mb 并重载配置后按新预算淘汰"""
+    global _cache
+    max_bytes = get_config().get("review_cache_mb", 100) * 1024 * 1024
+    if _cache is None:
+        os.makedirs(REVIEW_CACHE_DIR, exist_ok=True)
+        _cache = TTSCache(
+            os.path.join(REVIEW_CACHE_DIR, "index.db"),
+            max_bytes=max_bytes,
+            on_evict=_delete_file,
+        )
+    elif _cache.max_bytes != max_bytes:
+        _cache.max_bytes = max_bytes
+        _cache.evict()
+    return _cache
+
+def card_text(card):
+    """卡片中要朗读的文本：review_tts_field 指定的字段，未指定或不存在时为第一个字段"""
+    note = card.note()
+    field = get_config().get("review_tts_field", "")
+    text = note[field] if field and field in note else note.fields[0]
+    return strip_html_tags(SOUND_TAG_RE.sub("", text)).strip()
+
+def _lookup(cache, cache_key):
+    with perf.span("review_cache_lookup") as fields:
+        filename = cache.get(cache_key)
+        path = os.path.join(REVIEW_CACHE_DIR, filename) if filename else None
+        if path is not None and not os.path.exists(path):
+            cache.discard(cache_key)
+            path = None
+        fields["hit"] = path is not None
+    cache.record(hit=path is not None)
+    return path
+
+def submit_review_speech(text):
+    """
+    返回 concurrent.futures.Future（结果为缓存中音频文件的完整路径）
+    命中缓存时返回已完成的 Future；同一文本正在合成时返回同一个 Future
+    """
+    config = get_config()
+    lang_code, voice = resolve_voice(text)
+    cache_key = speech_cache_key(text, voice)
+    running = _pending.get(cache_key)
+    if running is not None:
+        return running
+
+    cache = get_review_cache()
+    path = _lookup(cache, cache_key)
+    if path is not None:
+        future = concurrent.futures.Future()
+        future.set_result(path)
+        return future
+
+    output_filename = os.path.join(REVIEW_CACHE_DIR, f"tts_{lang_code}_{cache_key[:16]}.mp3")
+
+    async def job():
+        path = await get_engine().synthesize(
+            text, voice, config["speech_rate"], config["volume"], output_filename, dedupe=False
+        )
+        cache.put(cache_key, os.path.basename(path), os.path.getsize(path))
+        return path
+
+    future = get_engine().submit(job())
+    _pending[cache_key] = future
+    future.add_done_callback(lambda _future: _pending.pop(cache_key, None))
+    return future
+
+def prefetch(current_card_id):
+    """在后台为调度队列中接下来的卡片合成语音"""
+    depth = get_config().get("review_prefetch", 5)
+    if depth <= 0:
+        return
+    try:
+        queued = mw.col.sched.get_queued_cards(fetch_limit=depth + 1)
+    except AttributeError:
+        # 旧版调度器没有队列接口：只做即时合成
+        return
+    for queued_card in queued.cards:
+        card_id = queued_card.card.id
+        if card_id == current_card_id:
+            continue
+        text = card_text(mw.col.get_card(card_id))
+        if text:
+            submit_review_speech(text)
+
+def on_show_question():
+    """显示问题时：播放（或合成后播放）当前卡片的语音，并预取后续卡片"""
+    card = mw.reviewer.card
+    if card is None:
+        return
+    text = card_text(card)
+    if text:
+        try:
+            future = submit_review_speech(text)
+        except Exception as e:
+            tooltip(f"语音生成失败: {e}")
+        else:
+            card_id = card.id
+            future.add_done_callback(
+                lambda _future: mw.taskman.run_on_main(lambda: on_speech_ready(card_id, future))
+            )
+    prefetch(card.id)
+
+def on_speech_ready(card_id, future):
+    """（主线程）语音就绪时，若仍在复习同一张卡片则播放"""
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        tooltip(f"语音生成失败: {error}")
+        return
+    card = mw.reviewer.card
+    if mw.state != "review" or card is None or card.id != card_id:
+        return
+    # 排在卡片自带音频之前播放，不打断正在播放的内容
+    av_player.insert_file(future.result())
+
+def stats_text():
+    """复习语音缓存统计"""
+    cache = get_review_cache()
+    stats = cache.stats()
+    return (
+        f"复习语音缓存: {stats['entries']} 条，"
+        f"{stats['bytes'] / 1024 / 1024:.1f} / {cache.max_bytes / 1024 / 1024:.0f} MB，"
+        f"本次会话命中 {stats['hits']} / {stats['hits'] + stats['misses']}，"
+        f"预取中 {len(_pending)}"
+    )
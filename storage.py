@@ -0,0 +1,141 @@
+# file storage.py
+"""
+音频文件的原子写入：
+- 短音频先缓存在内存中，超过上限后转存到同目录的隐藏临时文件，内存占用不随文本长度增长
+- 成功后 fsync 并 os.replace 到目标文件名；失败或进程被杀死时不会留下不完整的媒体文件
+- 写入前按内容哈希查重：与已有媒体文件字节完全相同时直接复用已有文件
+"""
+import os
+import glob
+import hashlib
+import tempfile
+
+# 内存缓冲上限，超过后转存到临时文件
+MEMORY_LIMIT = 256 * 1024
+TEMP_PREFIX = ".edge-tts-"
+TEMP_SUFFIX = ".part"
+
+def cleanup_partial_files(directory):
+    """删除上次异常退出时残留的临时文件"""
+    for path in glob.glob(os.path.join(directory, f"{TEMP_PREFIX}*{TEMP_SUFFIX}")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _fsync_directory(directory):
+    # 确保 rename 本身落盘；Windows 不支持打开目录
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class AtomicWriter:
+    """
+    用法：
+        with AtomicWriter(path, media_index) as writer:
+            writer.write(data)
+            final_path = writer.commit()
+    with 块内发生异常或未调用 commit 时，临时数据会被丢弃
+    """
+
+    def __init__(self, path, media_index=None, memory_limit=MEMORY_LIMIT):
+        self.path = path
+        self.media_index = media_index
+        self.memory_limit = memory_limit
+        self.size = 0
+        self._hash = hashlib.sha1()
+        self._buffer = bytearray()
+        self._file = None
+        self._temp_path = None
+        self._committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._committed:
+            self.abort()
+        return False
+
+    def _open_temp(self):
+        fd, self._temp_path = tempfile.mkstemp(
+            prefix=TEMP_PREFIX, suffix=TEMP_SUFFIX, dir=os.path.dirname(self.path)
+        )
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        if self._file is not None:
+            self._file.write(data)
+            return
+        self._buffer += data
+        if len(self._buffer) > self.memory_limit:
+            self._open_temp()
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    def commit(self):
+        """发布文件并返回最终路径（内容重复时返回已有文件的路径）"""
+        digest = self.digest
+        if self.media_index is not None:
+            existing = self.media_index.find(digest)
+            if existing is not None and existing != self.path:
+                self.abort()
+                self._committed = True
+                return existing
+
+        if self._file is None:
+            self._open_temp()
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self._temp_path, self.path)
+        self._temp_path = None
+        _fsync_directory(os.path.dirname(self.path))
+        self._committed = True
+
+        if self.media_index is not None:
+            self.media_index.add(digest, self.path)
+        return self.path
+
+    def abort(self):
+        self._buffer = bytearray()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temp_path is not None:
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+            self._temp_path = None
+
+class MediaContentIndex:
+    """基于缓存数据库的内容哈希索引：digest -> 媒体目录中的文件"""
+
+    def __init__(self, cache, media_dir):
+        # media_dir 为返回当前媒体目录的函数（切换配置文件后目录会变化）
+        self.cache = cache
+        self.media_dir = media_dir
+
+    def find(self, digest):
+        filename = self.cache.find_content(digest)
+        if filename is None:
+            return None
+        path = os.path.join(self.media_dir(), filename)
+        return path if os.path.exists(path) else None
+
+    def add(self, digest, path):
+        self.cache.add_content(digest, os.path.basename(path))
@@ -0,0 +1,53 @@
+# file tests/bench_latency.py
+"""
+单条请求延迟基准：edge_tts.Communicate（每次新建事件循环、会话与连接）对比常驻合成引擎
+两者都连接本地模拟服务器，只比较客户端开销（建连、握手、事件循环）；
+引擎的限流器放宽到不会触发，否则测到的是默认的每秒请求数上限：
+    python tests/bench_latency.py [请求数]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+from support import StubServer, load_addon
+
+load_addon()
+import edge_tts
+import edge_tts.communicate
+from edge_tts_addon.engine import SynthesisEngine
+from edge_tts_addon.ratelimit import AdaptiveLimiter
+
+TEXT = "hello world"
+VOICE = "en-US-AriaNeural"
+
+def bench_communicate(url, path, count):
+    edge_tts.communicate.WSS_URL = url
+    start = time.perf_counter()
+    for _ in range(count):
+        asyncio.run(edge_tts.Communicate(TEXT, VOICE).save(path))
+    return (time.perf_counter() - start) / count
+
+def bench_engine(url, path, count):
+    engine = SynthesisEngine(wss_url=url, limiter=AdaptiveLimiter(rate=10_000, burst=10_000))
+    try:
+        start = time.perf_counter()
+        for _ in range(count):
+            engine.run(engine.synthesize(TEXT, VOICE, "+0%", "+0%", path), timeout=30)
+        return (time.perf_counter() - start) / count
+    finally:
+        engine.shutdown()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with StubServer() as server, tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "out.mp3")
+        before = bench_communicate(server.url, path, count)
+        after = bench_engine(server.url, path, count)
+    print(f"{count} 次请求，平均每次：")
+    print(f"  Communicate: {before * 1000:.2f} ms")
+    print(f"  合成引擎:    {after * 1000:.2f} ms（{before / after:.1f}x）")
+
+if __name__ == "__main__":
+    main()
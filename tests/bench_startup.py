@@ -0,0 +1,105 @@
+# file tests/bench_startup.py
+"""
+插件启动耗时基准：每次在新的子进程中执行 __init__.py，aqt / anki 用占位模块代替，
+只测插件自身的导入开销；同时列出启动时就被导入的较重依赖（应当为空）。
+作为对比，另测直接导入这些依赖的耗时（即改为延迟导入之前启动时要付出的开销）：
+    python tests/bench_startup.py [次数]
+"""
+import os
+import sys
+import json
+import time
+import types
+import statistics
+import subprocess
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "edge_tts_addon"
+# 应在首次使用时才导入的依赖
+HEAVY_MODULES = ("edge_tts", "aiohttp", "langdetect", "tabulate")
+
+class Placeholder:
+    """任意属性访问、调用都返回占位对象"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return Placeholder()
+
+    def __call__(self, *args, **kwargs):
+        return Placeholder()
+
+def install_anki_placeholders():
+    modules = {}
+    for name in ("aqt", "aqt.qt", "aqt.utils", "aqt.editor", "aqt.sound",
+                 "anki", "anki.hooks", "anki.collection", "anki.utils"):
+        modules[name] = sys.modules[name] = types.ModuleType(name)
+    modules["aqt"].mw = Placeholder()
+    modules["aqt"].gui_hooks = Placeholder()
+    # 插件导入时会创建菜单项；其余为 batch.py 中的对话框控件
+    widgets = ("QAction", "QMenu", "QDialog", "QComboBox", "QCheckBox", "QSpinBox",
+               "QFormLayout", "QDialogButtonBox", "QVBoxLayout")
+    for name in widgets:
+        setattr(modules["aqt.qt"], name, Placeholder)
+    modules["aqt.qt"].__all__ = list(widgets)
+    for name in ("showInfo", "showText", "tooltip"):
+        setattr(modules["aqt.utils"], name, print)
+    modules["aqt.editor"].Editor = Placeholder
+    modules["aqt.sound"].av_player = Placeholder()
+    modules["anki.hooks"].addHook = lambda *args: None
+    modules["anki.collection"].SearchNode = Placeholder
+    modules["anki.utils"].ids2str = lambda ids: "(" + ",".join(str(i) for i in ids) + ")"
+
+def import_addon():
+    """以包的形式执行插件的 __init__.py，返回模块对象"""
+    install_anki_placeholders()
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE, os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = module
+    spec.loader.exec_module(module)
+    return module
+
+def import_heavy_modules():
+    sys.path.insert(0, os.path.join(ROOT, "vendor"))
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+def child(mode):
+    start = time.perf_counter()
+    if mode == "addon":
+        import_addon()
+    else:
+        import_heavy_modules()
+    elapsed = time.perf_counter() - start
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(json.dumps({"seconds": elapsed, "heavy": heavy}))
+
+def measure(mode):
+    """在新的子进程中导入一次，返回 {"seconds", "heavy"}"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    addon = [measure("addon") for _ in range(runs)]
+    eager = [measure("heavy") for _ in range(runs)]
+    addon_ms = statistics.median(result["seconds"] for result in addon) * 1000
+    eager_ms = statistics.median(result["seconds"] for result in eager) * 1000
+    heavy = sorted({name for result in addon for name in result["heavy"]})
+    print(f"{runs} 次导入，中位数：")
+    print(f"  插件 __init__.py: {addon_ms:.1f} ms")
+    print(f"  {' / '.join(HEAVY_MODULES)}: {eager_ms:.1f} ms（延迟导入节省的启动开销）")
+    print(f"  启动时导入的较重依赖: {', '.join(heavy) if heavy else '无'}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        child(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,48 @@
+# file tests/conftest.py
+import sys
+
+import pytest
+
+from bench_startup import import_addon
+from support import PACKAGE, StubServer, load_addon
+
+load_addon()
+
+@pytest.fixture
+def stub():
+    with StubServer() as server:
+        yield server
+
+@pytest.fixture
+def make_engine():
+    """创建连接到本地模拟服务器的合成引擎，测试结束时关闭"""
+    from edge_tts_addon.engine import SynthesisEngine
+
+    engines = []
+
+    def make(server, **kwargs):
+        engine = SynthesisEngine(wss_url=server.url, **kwargs)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.shutdown()
+
+# 依赖 aqt 的模块（review.py、batch.py），测试结束后需要移除
+ANKI_MODULES = (PACKAGE + ".review", PACKAGE + ".batch")
+
+@pytest.fixture(scope="module")
+def addon():
+    """
+    执行真正的 __init__.py（aqt / anki 用占位模块代替），以便 review.py 等模块的
+    from . import ... 可用；结束后恢复测试用的包
+    """
+    saved = {name: module for name, module in sys.modules.items()
+             if name == PACKAGE or name.split(".")[0] in ("aqt", "anki")}
+    module = import_addon()
+    yield module
+    for name in list(sys.modules):
+        if name in ANKI_MODULES or name.split(".")[0] in ("aqt", "anki"):
+            del sys.modules[name]
+    sys.modules.update(saved)
@@ -0,0 +1,176 @@
+# file tests/support.py
+"""
+测试与基准脚本共用的工具：
+- load_addon()：把插件目录作为包加载（不执行依赖 Anki 的 __init__.py），
+  之后可以 import edge_tts_addon.engine 等独立模块
+- StubServer：本地模拟的 Edge TTS websocket 服务，返回固定的 MP3 帧与边界元数据，
+  可按握手次数注入 403 / 429 / 503 等限流响应
+"""
+import os
+import re
+import sys
+import json
+import types
+import asyncio
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "edge_tts_addon"
+
+def load_addon():
+    vendor = os.path.join(ROOT, "vendor")
+    if vendor not in sys.path:
+        sys.path.insert(0, vendor)
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [ROOT]
+        sys.modules[PACKAGE] = package
+    return sys.modules[PACKAGE]
+
+load_addon()
+from aiohttp import web
+
+# MPEG-2 Layer III、48 kbps、24 kHz 的静音帧（144 字节，24 毫秒）
+FRAME = bytes([0xFF, 0xF3, 0x64, 0xC4]) + bytes(140)
+FRAME_TICKS = 240_000
+WORD_TICKS = 2_400_000
+GAP_TICKS = 1_200_000
+
+def audio_message(data):
+    header = b"X-RequestId:stub\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n"
+    return len(header).to_bytes(2, "big") + header + data
+
+def text_message(path, body="{}"):
+    return f"X-RequestId:stub\r\nContent-Type:application/json\r\nPath:{path}\r\n\r\n{body}"
+
+def ssml_words(message):
+    """取出 SSML 请求中 <prosody> 内的单词（<break> 等标签视为空白）"""
+    ssml = message.split("\r\n\r\n", 1)[1]
+    inner = ssml.split("<prosody", 1)[1].split(">", 1)[1].rsplit("</prosody>", 1)[0]
+    return re.sub(r"<[^>]+>", " ", inner).split()
+
+class StubServer:
+    """
+    用法：
+        with StubServer() as server:
+            engine = SynthesisEngine(wss_url=server.url)
+    reject(n) 返回第 n 次握手（从 0 开始）要返回的 HTTP 状态码，None 表示正常处理；
+    turn_delay 为每轮请求返回前的等待秒数（用于模拟慢速服务）；
+    drop_after 不为 None 时，每轮发送超过该字节数的音频后直接断开 TCP 连接（不发送 turn.end）
+    """
+
+    def __init__(self, reject=None, turn_delay=0.0, drop_after=None):
+        self.reject = reject
+        self.turn_delay = turn_delay
+        self.drop_after = drop_after
+        self.stats = {"handshakes": 0, "rejected": 0, "connections": 0, "turns": 0}
+        self.url = None
+        self._sockets = set()
+        self._loop = None
+        self._thread = None
+        self._runner = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="edge-tts-stub", daemon=True)
+        self._thread.start()
+        started.wait(10)
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get("/edge", self._handler)
+        app.on_shutdown.append(self._close_sockets)
+        self._runner = web.AppRunner(app, shutdown_timeout=1)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}/edge?TrustedClientToken=stub"
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+        self._loop.close()
+        self._loop = None
+
+    async def _shutdown(self):
+        await self._runner.cleanup()
+        # 仍在等待 turn_delay 的请求处理任务
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _close_sockets(self, app):
+        for ws in list(self._sockets):
+            await ws.close()
+
+    async def _handler(self, request):
+        handshake = self.stats["handshakes"]
+        self.stats["handshakes"] += 1
+        status = self.reject(handshake) if self.reject is not None else None
+        if status is not None:
+            self.stats["rejected"] += 1
+            return web.Response(status=status)
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.stats["connections"] += 1
+        self._sockets.add(ws)
+        try:
+            await self._serve(ws, request)
+        finally:
+            self._sockets.discard(ws)
+        return ws
+
+    async def _serve(self, ws, request):
+        word_boundary = False
+        async for message in ws:
+            if "Path:speech.config" in message.data:
+                word_boundary = '"wordBoundaryEnabled":"true"' in message.data
+                continue
+            self.stats["turns"] += 1
+            if self.turn_delay:
+                await asyncio.sleep(self.turn_delay)
+            await ws.send_str(text_message("turn.start"))
+            if self.drop_after is not None:
+                await self._send_then_drop(ws, request)
+                return
+            offset = 1_000_000
+            for word in ssml_words(message.data):
+                metadata = {"Metadata": [{
+                    "Type": "WordBoundary" if word_boundary else "SentenceBoundary",
+                    "Data": {"Offset": offset, "Duration": WORD_TICKS, "text": {"Text": word}},
+                }]}
+                await ws.send_str(text_message("audio.metadata", json.dumps(metadata)))
+                offset += WORD_TICKS + GAP_TICKS
+            await ws.send_bytes(audio_message(FRAME * max(1, offset // FRAME_TICKS)))
+            await ws.send_str(text_message("turn.end"))
+
+    async def _send_then_drop(self, ws, request):
+        chunk = FRAME * 256
+        sent = 0
+        while sent <= self.drop_after:
+            await ws.send_bytes(audio_message(chunk))
+            sent += len(chunk)
+        request.transport.abort()
@@ -0,0 +1,120 @@
+# file tests/test_batch.py
+"""批量生成的写回与结束处理（batch.py）：aqt / anki 用占位模块代替，对话框与流水线用替身"""
+import types
+import importlib
+import concurrent.futures
+
+import pytest
+
+from support import PACKAGE
+
+class Note(dict):
+    """只实现 batch.py 用到的 note[field] 读写与 field in note"""
+
+    def __init__(self, nid, fields):
+        super().__init__(fields)
+        self.id = nid
+
+class Collection:
+    def __init__(self, notes):
+        self.notes = notes
+        self.updates = []
+
+    def get_note(self, nid):
+        # 与 Anki 相同：每次返回新的笔记对象，写回前的修改互不可见
+        return Note(nid, self.notes[nid])
+
+    def update_notes(self, notes):
+        self.updates.append(notes)
+        for note in notes:
+            self.notes[note.id] = dict(note)
+
+def run_now(task, on_done):
+    """同步执行 taskman.run_in_background"""
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(task())
+    except BaseException as e:
+        future.set_exception(e)
+    on_done(future)
+
+@pytest.fixture
+def messages():
+    """showInfo 显示过的消息"""
+    return []
+
+@pytest.fixture
+def batch(addon, messages, monkeypatch):
+    batch = importlib.import_module(PACKAGE + ".batch")
+    col = Collection({
+        1: {"Front": "one", "Back": ""},
+        2: {"Front": "two", "Back": "old"},
+        3: {"Front": "three", "Back": ""},
+    })
+    mw = types.SimpleNamespace(
+        col=col,
+        progress=types.SimpleNamespace(
+            start=lambda **kwargs: None,
+            update=lambda **kwargs: None,
+            finish=lambda: None,
+            want_cancel=lambda: False,
+            timer=lambda *args, **kwargs: types.SimpleNamespace(stop=lambda: None),
+        ),
+        taskman=types.SimpleNamespace(run_on_main=lambda fn: fn(), run_in_background=run_now),
+    )
+    dialog = types.SimpleNamespace(
+        exec=lambda: True,
+        source=types.SimpleNamespace(currentText=lambda: "Front"),
+        target=types.SimpleNamespace(currentText=lambda: "Back"),
+        skip_existing=types.SimpleNamespace(isChecked=lambda: True),
+        concurrency=types.SimpleNamespace(value=lambda: 2),
+    )
+    limiter = types.SimpleNamespace(is_open=False)
+    monkeypatch.setattr(batch, "mw", mw)
+    monkeypatch.setattr(batch, "BatchDialog", lambda parent, names: dialog)
+    monkeypatch.setattr(batch, "field_names_for_notes", lambda note_ids: ["Front", "Back"])
+    monkeypatch.setattr(batch, "get_config", lambda: {})
+    monkeypatch.setattr(batch, "get_cache", lambda: None)
+    monkeypatch.setattr(batch, "get_engine", lambda: types.SimpleNamespace(limiter=limiter))
+    monkeypatch.setattr(batch, "showInfo", messages.append)
+    return batch
+
+def test_apply_results_updates_all_notes_at_once(batch):
+    col = batch.mw.col
+    batch.apply_results([([1, 2], "/media/a.mp3"), ([3], "/media/b.mp3"), ([1], "/media/c.mp3")], "Back")
+    assert len(col.updates) == 1
+    assert [note["Back"] for note in col.updates[0]] == [
+        "[sound:a.mp3]\n[sound:c.mp3]",
+        "old\n[sound:a.mp3]",
+        "[sound:b.mp3]",
+    ]
+    batch.apply_results([], "Back")
+    assert len(col.updates) == 1
+
+def cached_jobs(note_ids, source_field, target_field, skip_existing):
+    return [], [{"nids": [1, 3], "path": "/media/a.mp3"}], 1
+
+STATS = {"done": 0, "failed": 0}
+
+@pytest.mark.parametrize("pipeline_error, message", [
+    (None, "批量生成完成"),
+    (RuntimeError("boom"), "批量生成语音时出错: boom"),
+    (concurrent.futures.CancelledError(), None),
+])
+def test_browser_is_redrawn_however_the_batch_ends(batch, messages, monkeypatch, pipeline_error, message):
+    def run_pipeline(jobs, **kwargs):
+        if pipeline_error is not None:
+            raise pipeline_error
+        return dict(STATS)
+
+    monkeypatch.setattr(batch, "build_jobs", cached_jobs)
+    monkeypatch.setattr(batch, "run_pipeline", run_pipeline)
+    redraws = []
+    batch.start_batch(None, [1, 2, 3], on_finished=lambda: redraws.append(True))
+    assert redraws == [True]
+    # 命中缓存的结果在出错、取消时同样已写回
+    assert batch.mw.col.notes[1]["Back"] == batch.mw.col.notes[3]["Back"] == "[sound:a.mp3]"
+    if message is None:
+        assert messages == []
+    else:
+        assert messages[0].startswith(message)
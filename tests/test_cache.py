@@ -0,0 +1,118 @@
+# file tests/test_cache.py
+import pytest
+
+from edge_tts_addon import cache as cache_module
+from edge_tts_addon.cache import TTSCache, make_key
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可控的 time.time()：每次调用前进 1 秒，保证最近使用时间严格递增"""
+    now = [1000.0]
+
+    def tick():
+        now[0] += 1
+        return now[0]
+
+    monkeypatch.setattr(cache_module.time, "time", tick)
+
+@pytest.fixture
+def make_cache(tmp_path, clock):
+    caches = []
+
+    def make(**kwargs):
+        cache = TTSCache(str(tmp_path / "index.db"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+def test_key_is_stable_and_normalized():
+    key = make_key("hello  world ", "en-US-AriaNeural", "+0%", "+0%")
+    assert key == make_key("hello world", "en-US-AriaNeural", "+0%", "+0%")
+    assert key != make_key("hello world", "en-US-GuyNeural", "+0%", "+0%")
+    assert len(key) == 40
+
+def test_entry_limit_evicts_least_recently_used(make_cache):
+    evicted = []
+    cache = make_cache(max_entries=2, on_evict=evicted.append)
+    cache.put("a", "a.mp3", 10)
+    cache.put("b", "b.mp3", 10)
+    # 读取刷新最近使用时间：a 比 b 新
+    assert cache.get("a") == "a.mp3"
+    cache.put("c", "c.mp3", 10)
+    assert evicted == ["b.mp3"]
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("a.mp3", "c.mp3")
+    assert cache.stats()["entries"] == 2
+
+def test_byte_limit_evicts_until_under_budget(make_cache):
+    evicted = []
+    cache = make_cache(max_bytes=100, on_evict=evicted.append)
+    for name, size in (("a", 40), ("b", 40), ("c", 40)):
+        cache.put(name, f"{name}.mp3", size)
+    assert evicted == ["a.mp3"]
+    cache.put("big", "big.mp3", 90)
+    assert evicted == ["a.mp3", "b.mp3", "c.mp3"]
+    assert cache.stats()["bytes"] == 90
+
+def test_lowering_the_limit_evicts_on_demand(make_cache):
+    cache = make_cache()
+    for name in "abcde":
+        cache.put(name, f"{name}.mp3", 1)
+    cache.max_entries = 2
+    cache.evict()
+    assert [cache.get(name) for name in "abcde"] == [None, None, None, "d.mp3", "e.mp3"]
+
+def test_eviction_removes_unreferenced_content_digests(make_cache):
+    cache = make_cache(max_entries=2)
+    cache.put("a", "a.mp3")
+    cache.add_content("digest-a", "a.mp3")
+    # b 与 a 内容相同（查重后指向同一文件），c 为新文件
+    cache.put("b", "a.mp3")
+    cache.put("c", "c.mp3")
+    cache.add_content("digest-c", "c.mp3")
+    # a 被淘汰，但 a.mp3 仍被 b 引用
+    assert cache.find_content("digest-a") == "a.mp3"
+    cache.put("d", "d.mp3")
+    assert cache.find_content("digest-a") is None
+    assert cache.find_content("digest-c") == "c.mp3"
+
+def test_content_digests_are_bounded_by_the_entry_limit(make_cache):
+    cache = make_cache(max_entries=3)
+    for index in range(5):
+        cache.add_content(f"digest-{index}", f"{index}.mp3")
+    assert cache.stats()["contents"] == 3
+    assert cache.find_content("digest-0") is None
+    assert cache.find_content("digest-4") == "4.mp3"
+
+def test_discard_forgets_the_content_digest(make_cache):
+    cache = make_cache()
+    cache.put("a", "a.mp3")
+    cache.add_content("digest-a", "a.mp3")
+    cache.discard("a")
+    assert cache.get("a") is None
+    assert cache.find_content("digest-a") is None
+
+def test_hit_and_miss_counts(make_cache):
+    cache = make_cache()
+    cache.record(hit=False)
+    cache.record(hit=True)
+    cache.record(hit=True)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    cache.put("a", "a.mp3", 5)
+    cache.clear()
+    assert cache.stats() == {"entries": 0, "bytes": 0, "contents": 0, "hits": 0, "misses": 0}
+
+def test_index_survives_reopening(tmp_path):
+    path = str(tmp_path / "index.db")
+    cache = TTSCache(path)
+    cache.put("a", "a.mp3", 5)
+    cache.add_content("digest-a", "a.mp3")
+    cache.close()
+    cache = TTSCache(path)
+    assert cache.get("a") == "a.mp3"
+    assert cache.find_content("digest-a") == "a.mp3"
+    cache.close()
@@ -0,0 +1,116 @@
+# file tests/test_catalog.py
+import os
+import json
+import time
+
+from support import ROOT
+from edge_tts_addon.catalog import VoiceCatalog, VoiceResolver, parse_voice_name
+
+SNAPSHOT_PATH = os.path.join(ROOT, "voices_snapshot.json")
+
+def voice(name, gender="Female"):
+    return {"ShortName": name, "Locale": parse_voice_name(name)[0], "Gender": gender, "Extra": 1}
+
+VOICES = [
+    voice("en-GB-SoniaNeural"),
+    voice("en-US-AriaNeural"),
+    voice("en-US-GuyNeural", "Male"),
+    voice("en-US-JennyNeural"),
+    voice("fr-CA-SylvieNeural"),
+    voice("fr-FR-DeniseNeural"),
+    voice("fr-FR-HenriNeural", "Male"),
+    voice("pt-BR-FranciscaNeural"),
+    voice("pt-PT-DuarteNeural", "Male"),
+]
+
+def test_parse_voice_name():
+    assert parse_voice_name("zh-CN-XiaoxiaoNeural") == ("zh-CN", "zh")
+    assert parse_voice_name("sr-Latn-RS-NicholasNeural") == ("sr-Latn-RS", "sr")
+    assert parse_voice_name("Aria") == (None, None)
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "voices.json")
+    catalog = VoiceCatalog(VOICES, fetched=123.0)
+    catalog.save(path)
+    loaded = VoiceCatalog.load(path)
+    assert loaded.voices == catalog.voices
+    assert "Extra" not in loaded.voices[0]
+    assert (loaded.fetched, loaded.digest, loaded.complete) == (123.0, catalog.digest, True)
+
+def test_load_missing_or_corrupt_file(tmp_path):
+    assert VoiceCatalog.load(str(tmp_path / "missing.json")) is None
+    corrupt = tmp_path / "voices.json"
+    corrupt.write_text("{not json", encoding="utf-8")
+    assert VoiceCatalog.load(str(corrupt)) is None
+    corrupt.write_text(json.dumps({"fetched": 1}), encoding="utf-8")
+    assert VoiceCatalog.load(str(corrupt)) is None
+
+def test_refreshed_keeps_catalog_when_digest_is_unchanged():
+    catalog = VoiceCatalog(VOICES, fetched=0.0)
+    assert catalog.is_stale()
+    same = catalog.refreshed(VOICES)
+    assert same is catalog
+    assert not same.is_stale()
+
+    changed = catalog.refreshed(VOICES[:-1])
+    assert changed is not catalog
+    assert changed.digest != catalog.digest
+    assert "pt-PT-DuarteNeural" not in changed
+    assert time.time() - changed.fetched < 5
+
+def test_find_prefers_locale_then_gender():
+    catalog = VoiceCatalog(VOICES)
+    # 同地区优先于同语言，同性别优先
+    assert catalog.find("fr", locale="fr-CA") == "fr-CA-SylvieNeural"
+    assert catalog.find("fr", locale="fr-FR", gender="Male") == "fr-FR-HenriNeural"
+    assert catalog.find("fr", locale="fr-BE", gender="Male") == "fr-FR-HenriNeural"
+    # 只给语言时选语音最多的地区
+    assert catalog.find("en") == "en-US-AriaNeural"
+    assert catalog.find("en", gender="Male") == "en-US-GuyNeural"
+    assert catalog.find("pt", gender="Male") == "pt-PT-DuarteNeural"
+    assert catalog.find("de") is None
+    assert catalog.languages == {"en", "fr", "pt"}
+
+def test_resolver_replaces_missing_voices():
+    catalog = VoiceCatalog(VOICES)
+    resolver = VoiceResolver(
+        catalog,
+        {"en": "en-US-AriaNeural", "fr": "fr-FR-NoSuchNeural", "de": "de-DE-KatjaNeural"},
+        "en-US-AriaNeural",
+    )
+    assert resolver.gender == "Female"
+    assert resolver.voice_for("en") == "en-US-AriaNeural"
+    assert resolver.voice_for("fr") == "fr-FR-DeniseNeural"
+    # 目录中没有该语言：退回默认语音
+    assert resolver.voice_for("de") == "en-US-AriaNeural"
+    assert resolver.problems == [
+        "voice_mapping.fr: 语音 fr-FR-NoSuchNeural 不存在，改用 fr-FR-DeniseNeural",
+        "voice_mapping.de: 语音 de-DE-KatjaNeural 不存在",
+    ]
+    # 未配置的语言：目录中最接近的语音
+    assert resolver.voice_for("pt") == "pt-BR-FranciscaNeural"
+    assert resolver.voice_for("it") == "en-US-AriaNeural"
+
+def test_resolver_replaces_missing_default_voice():
+    resolver = VoiceResolver(VoiceCatalog(VOICES), {}, "en-AU-NoSuchNeural")
+    assert resolver.default_voice == "en-US-AriaNeural"
+    assert resolver.problems == ["default_voice: 语音 en-AU-NoSuchNeural 不存在，改用 en-US-AriaNeural"]
+
+def test_offline_catalog_from_bundled_snapshot():
+    snapshot = VoiceCatalog.load_snapshot(SNAPSHOT_PATH)
+    assert len(snapshot) > 50
+    catalog = VoiceCatalog.from_names(["en-US-AriaNeural", "de-AT-IngridNeural"], snapshot=snapshot)
+    # 快照不完整：不校验配置中的语音，但未配置的语言可以选到最接近的语音
+    assert not catalog.complete
+    assert "de-AT-IngridNeural" in catalog
+    resolver = VoiceResolver(catalog, {"de": "de-AT-IngridNeural"}, "en-US-AriaNeural")
+    assert resolver.problems == []
+    assert resolver.voice_for("de") == "de-AT-IngridNeural"
+    assert parse_voice_name(resolver.voice_for("it"))[1] == "it"
+    assert parse_voice_name(resolver.voice_for("pl"))[1] == "pl"
+    assert {"it", "pt", "pl", "nl", "sv"} <= catalog.languages
+
+def test_missing_snapshot_falls_back_to_config_names(tmp_path):
+    assert VoiceCatalog.load_snapshot(str(tmp_path / "missing.json")) == []
+    catalog = VoiceCatalog.from_names(["en-US-AriaNeural", "bad-name"])
+    assert catalog.voices == [{"ShortName": "en-US-AriaNeural", "Locale": "en-US", "Gender": None}]
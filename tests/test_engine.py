@@ -0,0 +1,113 @@
+# file tests/test_engine.py
+import os
+import time
+import asyncio
+import concurrent.futures
+
+import pytest
+
+from support import StubServer
+from edge_tts_addon import storage
+from edge_tts_addon.cache import TTSCache
+from edge_tts_addon.storage import MEMORY_LIMIT, MediaContentIndex, cleanup_partial_files
+
+VOICE = "en-US-AriaNeural"
+
+def synthesize(engine, text, path, timeout=10):
+    return engine.run(engine.synthesize(text, VOICE, "+0%", "+0%", str(path)), timeout=timeout)
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_requests_share_one_websocket(stub, make_engine, tmp_path):
+    engine = make_engine(stub)
+    for index in range(5):
+        path = synthesize(engine, f"hello {index}", tmp_path / f"{index}.mp3")
+        assert os.path.getsize(path) > 0
+    assert stub.stats == {"handshakes": 1, "rejected": 0, "connections": 1, "turns": 5}
+
+def test_no_partial_files_are_left(stub, make_engine, tmp_path):
+    engine = make_engine(stub)
+    synthesize(engine, "hello world", tmp_path / "out.mp3")
+    assert os.listdir(tmp_path) == ["out.mp3"]
+
+def test_dropped_connection_leaves_no_partial_files(make_engine, tmp_path, monkeypatch):
+    # 断开前已收到超过内存上限的音频，数据已转存到 .part 临时文件
+    temp_paths = []
+    mkstemp = storage.tempfile.mkstemp
+
+    def record_mkstemp(*args, **kwargs):
+        fd, path = mkstemp(*args, **kwargs)
+        temp_paths.append(path)
+        return fd, path
+
+    monkeypatch.setattr(storage.tempfile, "mkstemp", record_mkstemp)
+    with StubServer(drop_after=MEMORY_LIMIT * 2) as server:
+        engine = make_engine(server)
+        with pytest.raises(ConnectionError):
+            synthesize(engine, "hello world", tmp_path / "out.mp3")
+    assert len(temp_paths) == 1 and temp_paths[0].endswith(storage.TEMP_SUFFIX)
+    assert os.listdir(tmp_path) == []
+    assert engine.limiter.in_flight == 0
+
+def test_cleanup_partial_files(tmp_path):
+    for name in (".edge-tts-abc.part", ".edge-tts-def.part", "tts_en_1.mp3", "other.part"):
+        (tmp_path / name).write_bytes(b"x")
+    cleanup_partial_files(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["other.part", "tts_en_1.mp3"]
+
+def test_identical_audio_reuses_existing_media_file(stub, make_engine, tmp_path):
+    cache = TTSCache(str(tmp_path / "index.db"))
+    media = tmp_path / "media"
+    media.mkdir()
+    engine = make_engine(stub, media_index=MediaContentIndex(cache, lambda: str(media)))
+    first = synthesize(engine, "hello world", media / "a.mp3")
+    # 模拟服务器对相同字数的文本返回字节完全相同的音频
+    second = synthesize(engine, "other text", media / "b.mp3")
+    assert second == first == str(media / "a.mp3")
+    assert sorted(os.listdir(media)) == ["a.mp3"]
+
+    # 已有文件被删除后不再复用，正常写入新文件
+    os.remove(first)
+    assert synthesize(engine, "other text", media / "b.mp3") == str(media / "b.mp3")
+    cache.close()
+
+def test_shutdown_cancels_pending_requests(make_engine, tmp_path):
+    with StubServer(turn_delay=30) as server:
+        engine = make_engine(server)
+        future = engine.submit(engine.synthesize("hello", VOICE, "+0%", "+0%", str(tmp_path / "a.mp3")))
+        wait_for(lambda: server.stats["turns"] == 1)
+        engine.shutdown()
+        assert future.cancelled()
+        with pytest.raises(concurrent.futures.CancelledError):
+            future.result(0)
+    assert engine.limiter.in_flight == 0
+    assert os.listdir(tmp_path) == []
+
+def test_run_timeout_cancels_the_request(make_engine, tmp_path):
+    with StubServer(turn_delay=30) as server:
+        engine = make_engine(server)
+        with pytest.raises(concurrent.futures.TimeoutError):
+            synthesize(engine, "hello", tmp_path / "a.mp3", timeout=0.5)
+        wait_for(lambda: engine.limiter.in_flight == 0)
+
+def test_stalled_turn_times_out_and_returns_the_slot(make_engine, tmp_path):
+    with StubServer(turn_delay=4) as server:
+        engine = make_engine(server, receive_timeout=0.5)
+        start = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            synthesize(engine, "hello", tmp_path / "a.mp3")
+        assert time.monotonic() - start < 2
+        assert engine.limiter.in_flight == 0
+        assert os.listdir(tmp_path) == []
+
+def test_engine_restarts_after_shutdown(stub, make_engine, tmp_path):
+    engine = make_engine(stub)
+    synthesize(engine, "first", tmp_path / "a.mp3")
+    engine.shutdown()
+    path = synthesize(engine, "second", tmp_path / "b.mp3")
+    assert os.path.getsize(path) > 0
+    assert stub.stats["connections"] == 2
@@ -0,0 +1,113 @@
+# file tests/test_packing.py
+import asyncio
+
+import pytest
+
+from support import FRAME, GAP_TICKS, WORD_TICKS
+from edge_tts_addon.packing import (
+    PackingError,
+    cut_points,
+    iter_mp3_frames,
+    split_mp3,
+    utterance_spans,
+)
+from edge_tts_addon.pipeline import pack_jobs, run_pipeline_async
+
+VOICE = "en-US-AriaNeural"
+
+def boundaries(words, offset=1_000_000):
+    result = []
+    for word in words:
+        result.append({"offset": offset, "duration": WORD_TICKS, "text": word})
+        offset += WORD_TICKS + GAP_TICKS
+    return result
+
+def frame_count(data):
+    return sum(1 for _ in iter_mp3_frames(data))
+
+def test_utterance_spans_group_words_by_text():
+    texts = ["hello world", "good morning", "bye"]
+    spans = utterance_spans(texts, boundaries("hello world good morning bye".split()))
+    assert spans == [
+        (1_000_000, 7_000_000),
+        (8_200_000, 14_200_000),
+        (15_400_000, 17_800_000),
+    ]
+    assert cut_points(spans) == [0.76, 1.48]
+
+def test_repeated_words_are_assigned_in_order():
+    spans = utterance_spans(["yes", "yes"], boundaries(["yes", "yes"]))
+    assert spans == [(1_000_000, 3_400_000), (4_600_000, 7_000_000)]
+
+def test_missing_boundary_raises():
+    with pytest.raises(PackingError):
+        utterance_spans(["hello", "world"], boundaries(["hello"]))
+
+def test_split_mp3_cuts_on_frame_boundaries():
+    # 每帧 24 毫秒：0.1 秒之前 5 帧，0.1 ~ 0.2 秒 4 帧，其余 1 帧
+    pieces = split_mp3(FRAME * 10, [0.1, 0.2])
+    assert [frame_count(piece) for piece in pieces] == [5, 4, 1]
+    assert b"".join(pieces) == FRAME * 10
+
+def test_split_mp3_skips_id3_tag_and_garbage():
+    id3 = b"ID3\x04\x00\x00\x00\x00\x00\x02xx"
+    pieces = split_mp3(id3 + FRAME * 2 + b"\x00\x01" + FRAME * 2, [0.05])
+    assert [frame_count(piece) for piece in pieces] == [3, 1]
+
+def test_split_mp3_rejects_empty_piece():
+    with pytest.raises(PackingError):
+        split_mp3(FRAME * 2, [1.0])
+
+def test_packed_request_is_split_per_text(stub, make_engine, tmp_path):
+    engine = make_engine(stub)
+    texts = ["hello world", "good morning", "bye"]
+    paths = [str(tmp_path / f"{index}.mp3") for index in range(len(texts))]
+    result = engine.run(engine.synthesize_packed(texts, VOICE, "+0%", "+0%", paths), timeout=10)
+    assert result == paths
+    assert stub.stats["turns"] == 1
+
+    pieces = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pieces.append(f.read())
+    # 模拟服务器返回 79 帧，切分点在 0.76 秒与 1.48 秒
+    assert [frame_count(piece) for piece in pieces] == [32, 30, 17]
+    assert all(len(piece) % len(FRAME) == 0 for piece in pieces)
+
+def test_pipeline_sends_one_request_per_pack(stub, make_engine, tmp_path):
+    engine = make_engine(stub)
+    texts = [f"word{index}" for index in range(12)] + ["this sentence is long enough to go alone"]
+    jobs = [
+        {"text": text, "voice": VOICE, "rate": "+0%", "volume": "+0%",
+         "path": str(tmp_path / f"{index}.mp3")}
+        for index, text in enumerate(texts)
+    ]
+    packed = pack_jobs(jobs, max_chars=20, max_members=5)
+    stats = engine.run(
+        run_pipeline_async(packed, engine.synthesize, engine.synthesize_packed, concurrency=2),
+        timeout=10,
+    )
+    assert stats == {"total": 13, "done": 13, "failed": 0}
+    assert stub.stats["turns"] == 4
+    for job in jobs:
+        with open(job["path"], "rb") as f:
+            assert frame_count(f.read()) > 0
+
+def test_pipeline_falls_back_when_pack_cannot_be_split(tmp_path):
+    calls = []
+
+    async def synthesize(text, voice, rate, volume, path):
+        calls.append(text)
+        return path
+
+    async def synthesize_packed(texts, voice, rate, volume, paths):
+        raise PackingError("no boundaries")
+
+    jobs = [
+        {"text": text, "voice": VOICE, "rate": "+0%", "volume": "+0%",
+         "path": str(tmp_path / f"{text}.mp3")}
+        for text in ("apple", "pear")
+    ]
+    stats = asyncio.run(run_pipeline_async(pack_jobs(jobs, max_chars=20), synthesize, synthesize_packed))
+    assert stats == {"total": 2, "done": 2, "failed": 0}
+    assert calls == ["apple", "pear"]
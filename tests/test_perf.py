@@ -0,0 +1,80 @@
+# file tests/test_perf.py
+import json
+import time
+
+import pytest
+
+from edge_tts_addon import perf
+
+@pytest.fixture(autouse=True)
+def reset():
+    perf.clear()
+    yield
+    perf.set_trace_path(None)
+    wait_for(lambda: perf._trace_writer is None)
+    perf.clear()
+
+def read_names(path):
+    if not path.exists():
+        return []
+    return [json.loads(line)["name"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_records_are_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(perf, "TRACE_FLUSH_INTERVAL", 60)
+    monkeypatch.setattr(perf, "TRACE_BATCH_SIZE", 3)
+    path = tmp_path / "trace.jsonl"
+    perf.set_trace_path(str(path))
+    perf.record("a", 0.001)
+    perf.record("b", 0.002)
+    # record() 不做文件 I/O：攒满一批才由后台线程写入
+    assert read_names(path) == []
+    perf.record("c", 0.003, hit=True)
+    wait_for(lambda: read_names(path) == ["a", "b", "c"])
+
+def test_flush_writes_pending_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(perf, "TRACE_FLUSH_INTERVAL", 60)
+    path = tmp_path / "trace.jsonl"
+    perf.set_trace_path(str(path))
+    with perf.span("detect_language", hit=False):
+        pass
+    perf.flush()
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    assert (entry["name"], entry["hit"]) == ("detect_language", False)
+
+def test_switching_path_writes_buffer_to_the_old_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(perf, "TRACE_FLUSH_INTERVAL", 60)
+    old, new = tmp_path / "old.jsonl", tmp_path / "new.jsonl"
+    perf.set_trace_path(str(old))
+    perf.record("first", 0.001)
+    perf.set_trace_path(str(new))
+    perf.record("second", 0.001)
+    perf.set_trace_path(None)
+    perf.record("untraced", 0.001)
+    perf.flush()
+    assert (read_names(old), read_names(new)) == (["first"], ["second"])
+    # 记录仍进入环形缓冲区
+    assert {row["name"] for row in perf.summary()} == {"first", "second", "untraced"}
+
+def test_writer_thread_exits_when_tracing_stops(tmp_path, monkeypatch):
+    monkeypatch.setattr(perf, "TRACE_FLUSH_INTERVAL", 0.05)
+    path = tmp_path / "trace.jsonl"
+    perf.set_trace_path(str(path))
+    perf.record("a", 0.001)
+    wait_for(lambda: read_names(path) == ["a"])
+    writer = perf._trace_writer
+    perf.set_trace_path(None)
+    writer.join(5)
+    assert not writer.is_alive() and perf._trace_writer is None
+
+def test_summary_percentiles():
+    for ms in range(1, 101):
+        perf.record("stage", ms / 1000, bytes=10, hit=ms % 2 == 0)
+    (row,) = perf.summary()
+    assert (row["count"], row["p50"], row["p95"], row["max"]) == (100, 50.0, 95.0, 100.0)
+    assert (row["bytes"], row["hit_rate"]) == (1000, 0.5)
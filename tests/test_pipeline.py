@@ -0,0 +1,89 @@
+# file tests/test_pipeline.py
+import asyncio
+import threading
+
+import pytest
+
+from support import StubServer
+from edge_tts_addon import pipeline
+from edge_tts_addon.pipeline import pack_jobs, run_pipeline_async
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(pipeline, "retry_delay", lambda attempt: 0)
+
+def make_jobs(tmp_path, texts, voice="en-US-AriaNeural"):
+    return [
+        {"text": text, "voice": voice, "rate": "+0%", "volume": "+0%",
+         "path": str(tmp_path / f"{index}.mp3")}
+        for index, text in enumerate(texts)
+    ]
+
+def test_concurrency_is_bounded(tmp_path):
+    running = {"now": 0, "max": 0}
+
+    async def synthesize(text, voice, rate, volume, path):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return path
+
+    jobs = make_jobs(tmp_path, [f"word {i}" for i in range(20)])
+    stats = asyncio.run(run_pipeline_async(jobs, synthesize, concurrency=3))
+    assert stats == {"total": 20, "done": 20, "failed": 0}
+    assert running["max"] == 3
+
+def test_non_retryable_error_is_not_retried(tmp_path):
+    calls = []
+
+    async def synthesize(text, voice, rate, volume, path):
+        calls.append(text)
+        raise ValueError("bad voice")
+
+    results = []
+    jobs = make_jobs(tmp_path, ["hello"])
+    stats = asyncio.run(run_pipeline_async(
+        jobs, synthesize, max_retries=3, on_result=lambda job, error: results.append(error)
+    ))
+    assert stats["failed"] == 1
+    assert calls == ["hello"]
+    assert isinstance(results[0], ValueError)
+
+def test_cancel_event_stops_remaining_jobs(tmp_path):
+    cancel_event = threading.Event()
+
+    async def synthesize(text, voice, rate, volume, path):
+        cancel_event.set()
+        return path
+
+    jobs = make_jobs(tmp_path, [f"word {i}" for i in range(50)])
+    stats = asyncio.run(run_pipeline_async(jobs, synthesize, concurrency=1, cancel_event=cancel_event))
+    assert stats["done"] == 1
+    assert stats["failed"] == 0
+
+def test_transient_server_errors_are_retried(tmp_path, make_engine):
+    # 前两次握手返回 503，之后正常
+    with StubServer(reject=lambda n: 503 if n < 2 else None) as server:
+        engine = make_engine(server)
+        jobs = make_jobs(tmp_path, [f"sentence number {i} is long enough" for i in range(6)])
+        stats = engine.run(
+            run_pipeline_async(jobs, engine.synthesize, concurrency=2, max_retries=3), timeout=30
+        )
+    assert stats == {"total": 6, "done": 6, "failed": 0}
+    assert server.stats["rejected"] == 2
+    assert all((tmp_path / f"{i}.mp3").stat().st_size > 0 for i in range(6))
+
+def test_pack_jobs_groups_short_texts_by_voice(tmp_path):
+    jobs = make_jobs(tmp_path, ["apple", "pear", "a much longer sentence that is not packed"])
+    jobs += make_jobs(tmp_path, ["plum"], voice="fr-FR-DeniseNeural")
+    packed = pack_jobs(jobs, max_chars=30)
+    assert [len(job.get("members", [job])) for job in packed] == [2, 1, 1]
+    assert [member["text"] for member in packed[0]["members"]] == ["apple", "pear"]
+    assert packed[2]["voice"] == "fr-FR-DeniseNeural"
+    assert "members" not in packed[2]
+
+def test_pack_jobs_respects_member_limit(tmp_path):
+    jobs = make_jobs(tmp_path, [f"w{i}" for i in range(7)])
+    packed = pack_jobs(jobs, max_chars=30, max_members=3)
+    assert [len(job.get("members", [job])) for job in packed] == [3, 3, 1]
@@ -0,0 +1,173 @@
+# file tests/test_ratelimit.py
+import time
+import asyncio
+
+import aiohttp
+import pytest
+
+from support import StubServer
+from edge_tts_addon import pipeline
+from edge_tts_addon.pipeline import run_pipeline_async
+from edge_tts_addon.ratelimit import (
+    FAILED,
+    OK,
+    THROTTLED,
+    AdaptiveLimiter,
+    classify,
+    retry_delay,
+)
+
+VOICE = "en-US-AriaNeural"
+
+def throttle_error(status=429):
+    return aiohttp.ClientResponseError(None, (), status=status)
+
+async def cancel_while_waiting_for_token(limiter):
+    # 令牌已耗尽：acquire 占用名额后停在 _take_token 中
+    limiter.tokens = 0.0
+    task = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert limiter.in_flight == 1
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+def test_cancel_while_waiting_for_token_returns_the_slot():
+    limiter = AdaptiveLimiter(rate=20, burst=1, max_concurrency=1)
+
+    async def scenario():
+        await cancel_while_waiting_for_token(limiter)
+        assert limiter.in_flight == 0
+        # 并发上限为 1：名额没有归还时这里会一直等待
+        await asyncio.wait_for(limiter.acquire(), 1)
+        limiter.release(OK)
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+
+def test_cancel_during_half_open_probe_allows_next_probe():
+    limiter = AdaptiveLimiter(rate=20, burst=1, max_concurrency=4)
+
+    async def scenario():
+        limiter.open_until = time.monotonic() - 0.01
+        assert limiter.half_open
+        await cancel_while_waiting_for_token(limiter)
+        assert (limiter.in_flight, limiter.probing) == (0, False)
+        await asyncio.wait_for(limiter.acquire(), 1)
+        assert limiter.probing
+        limiter.release(OK)
+
+    asyncio.run(scenario())
+    assert not limiter.half_open
+    assert limiter.probing is False
+
+def test_cancelled_slot_is_released_as_failure():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=1)
+
+    async def scenario():
+        async def hold():
+            async with limiter.slot():
+                await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(hold())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+    assert limiter.stats[FAILED] == 1
+
+def test_aimd_halves_on_throttle_and_grows_on_success():
+    limiter = AdaptiveLimiter(max_concurrency=8, trip_after=10)
+    limiter.in_flight = 1
+    limiter.release(THROTTLED)
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.in_flight = 1
+        limiter.release(OK)
+    # 每个“窗口”（约 limit 次成功）加 1
+    assert 4.9 < limiter.limit < 5
+
+def test_breaker_trips_after_consecutive_throttles():
+    limiter = AdaptiveLimiter(trip_after=3, cooldown=5.0)
+    for expected_open in (False, False, True):
+        limiter.in_flight = 1
+        limiter.release(THROTTLED)
+        assert limiter.is_open is expected_open
+    assert limiter.stats["trips"] == 1
+    assert 4.0 <= limiter.resume_in <= 6.0
+    # 下一次熔断的冷却时间翻倍
+    assert limiter.cooldown == 10.0
+
+def test_success_started_before_trip_does_not_close_breaker():
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=4, trip_after=2, cooldown=5.0)
+
+    async def scenario():
+        # 复用连接上的请求在熔断前开始，熔断后才成功
+        held = await limiter.acquire()
+        for _ in range(2):
+            generation = await limiter.acquire()
+            limiter.release(THROTTLED, generation)
+        assert limiter.is_open
+        limiter.release(OK, held)
+        assert limiter.is_open
+        assert limiter.cooldown == 10.0
+
+        # 冷却结束后的探测请求成功才关闭熔断器
+        limiter.open_until = time.monotonic() - 0.01
+        probe = await limiter.acquire()
+        assert limiter.probing
+        limiter.release(OK, probe)
+        assert not limiter.is_open and not limiter.half_open
+        assert limiter.cooldown == 5.0
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+
+def test_classify():
+    assert classify(throttle_error(429)) == THROTTLED
+    assert classify(throttle_error(503)) == THROTTLED
+    assert classify(asyncio.TimeoutError()) == THROTTLED
+    assert classify(throttle_error(400)) == FAILED
+    assert classify(ValueError()) == FAILED
+
+def test_retry_delay_is_bounded():
+    for attempt in range(10):
+        delay = retry_delay(attempt, base=1.0, cap=8.0)
+        assert 0 <= delay <= min(8.0, 2 ** attempt)
+
+def test_throttled_handshakes_trip_breaker_and_recover(make_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "retry_delay", lambda attempt: 0)
+    limiter = AdaptiveLimiter(rate=1000, burst=1000, max_concurrency=4, trip_after=2, cooldown=0.2)
+    # 前 3 次握手返回 429
+    with StubServer(reject=lambda handshake: 429 if handshake < 3 else None) as server:
+        engine = make_engine(server, pool_size=0, limiter=limiter)
+        jobs = [
+            {"text": f"word {index}", "voice": VOICE, "rate": "+0%", "volume": "+0%",
+             "path": str(tmp_path / f"{index}.mp3")}
+            for index in range(8)
+        ]
+        limits = []
+        start = time.monotonic()
+        stats = engine.run(
+            run_pipeline_async(
+                jobs, engine.synthesize, concurrency=1, max_retries=5,
+                on_result=lambda job, error: limits.append(limiter.limit),
+            ),
+            timeout=10,
+        )
+        elapsed = time.monotonic() - start
+
+    assert stats == {"total": 8, "done": 8, "failed": 0}
+    assert server.stats["rejected"] == 3
+    assert limiter.stats[THROTTLED] == 3
+    # 第 2 次 429 熔断；冷却后的探测请求再次 429，以翻倍的冷却时间重新熔断
+    assert limiter.stats["trips"] == 2
+    # 熔断期间暂停发送：至少等待了两次冷却时间（0.2 + 0.4 秒，带 ±20% 抖动）
+    assert elapsed >= 0.48
+    # AIMD：4 -> 2 -> 1 -> 1，之后逐步回升
+    assert limits[0] == 1.0 + 1.0
+    assert limits == sorted(limits)
+    assert limiter.limit > 3
+    assert not limiter.is_open and not limiter.half_open
@@ -0,0 +1,147 @@
+# file tests/test_review.py
+"""复习时即时合成（review.py）：aqt / anki 用占位模块代替，合成请求发往本地模拟服务器"""
+import os
+import copy
+import types
+import importlib
+
+import pytest
+
+from support import PACKAGE, StubServer
+
+VOICE = "en-US-AriaNeural"
+
+@pytest.fixture
+def config(addon):
+    config = copy.deepcopy(addon.DEFAULT_CONFIG)
+    config.update(review_tts=True, review_prefetch=2)
+    return config
+
+@pytest.fixture
+def setup_review(addon, config, tmp_path, monkeypatch):
+    """返回 setup(server)：让 review.py 使用临时缓存目录和连接到 server 的引擎"""
+    from edge_tts_addon.engine import SynthesisEngine
+
+    review = importlib.import_module(PACKAGE + ".review")
+    engines = []
+
+    def setup(server):
+        engine = SynthesisEngine(wss_url=server.url)
+        engines.append(engine)
+        monkeypatch.setattr(review, "REVIEW_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(review, "_cache", None)
+        monkeypatch.setattr(review, "_pending", {})
+        monkeypatch.setattr(review, "get_config", lambda: config)
+        monkeypatch.setattr(review, "get_engine", lambda: engine)
+        monkeypatch.setattr(review, "resolve_voice", lambda text: ("en", VOICE))
+        return review
+
+    yield setup
+    if review._cache is not None:
+        review._cache.close()
+    for engine in engines:
+        engine.shutdown()
+
+def test_same_text_shares_one_request_then_hits_cache(setup_review):
+    with StubServer(turn_delay=0.3) as server:
+        review = setup_review(server)
+        first = review.submit_review_speech("hello world")
+        second = review.submit_review_speech("hello world")
+        assert second is first
+        path = first.result(10)
+        assert path.startswith(review.REVIEW_CACHE_DIR)
+        assert server.stats["turns"] == 1
+
+        cached = review.submit_review_speech("hello world")
+        assert cached.done() and cached.result() == path
+        assert server.stats["turns"] == 1
+        stats = review.get_review_cache().stats()
+        assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+def test_missing_file_is_synthesized_again(setup_review):
+    with StubServer() as server:
+        review = setup_review(server)
+        path = review.submit_review_speech("hello world").result(10)
+        os.remove(path)
+        assert review.submit_review_speech("hello world").result(10) == path
+        assert os.path.exists(path)
+        assert server.stats["turns"] == 2
+
+def test_cache_budget_evicts_and_deletes_files(setup_review, config):
+    with StubServer() as server:
+        review = setup_review(server)
+        older = review.submit_review_speech("alpha beta").result(10)
+        size = os.path.getsize(older)
+        # 预算只够 1.5 个文件：写入第二个时淘汰最久未使用的第一个
+        config["review_cache_mb"] = size * 1.5 / 1024 / 1024
+        review.get_review_cache()
+        newer = review.submit_review_speech("gamma delta").result(10)
+        assert not os.path.exists(older)
+        assert os.path.exists(newer)
+        assert review.get_review_cache().stats()["entries"] == 1
+
+        # 调小预算并重载配置：下次取缓存时按新预算淘汰
+        config["review_cache_mb"] = size / 2 / 1024 / 1024
+        assert review.get_review_cache().stats()["entries"] == 0
+        assert not os.path.exists(newer)
+
+class Note:
+    def __init__(self, **fields):
+        self.items = fields
+        self.fields = list(fields.values())
+
+    def __contains__(self, name):
+        return name in self.items
+
+    def __getitem__(self, name):
+        return self.items[name]
+
+def fake_mw(notes, queued=True):
+    """notes: 卡片 id -> Note，按调度顺序排列"""
+    def get_queued_cards(fetch_limit):
+        ids = list(notes)[:fetch_limit]
+        return types.SimpleNamespace(
+            cards=[types.SimpleNamespace(card=types.SimpleNamespace(id=card_id)) for card_id in ids]
+        )
+
+    def get_card(card_id):
+        return types.SimpleNamespace(id=card_id, note=lambda: notes[card_id])
+
+    sched = types.SimpleNamespace()
+    if queued:
+        sched.get_queued_cards = get_queued_cards
+    return types.SimpleNamespace(col=types.SimpleNamespace(sched=sched, get_card=get_card))
+
+def test_prefetch_submits_upcoming_cards(setup_review, config, monkeypatch):
+    with StubServer() as server:
+        review = setup_review(server)
+        config["review_tts_field"] = "Back"
+        notes = {
+            1: Note(Front="current", Back="current card"),
+            2: Note(Front="one", Back="[sound:old.mp3]<b>next card</b>"),
+            3: Note(Front="two", Back=""),
+            4: Note(Front="three", Back="beyond the prefetch depth"),
+        }
+        monkeypatch.setattr(review, "mw", fake_mw(notes))
+        submitted = []
+        submit = review.submit_review_speech
+
+        def record(text):
+            future = submit(text)
+            submitted.append((text, future))
+            return future
+
+        monkeypatch.setattr(review, "submit_review_speech", record)
+        review.prefetch(1)
+        # 跳过当前卡片和空字段；只取 review_prefetch + 1 张
+        assert [text for text, _future in submitted] == ["next card"]
+        submitted[0][1].result(10)
+        assert review.get_review_cache().stats()["entries"] == 1
+
+def test_prefetch_without_queue_api_does_nothing(setup_review, monkeypatch):
+    with StubServer() as server:
+        review = setup_review(server)
+        monkeypatch.setattr(review, "mw", fake_mw({2: Note(Front="next card")}, queued=False))
+        review.prefetch(1)
+        assert review._pending == {}
+        assert server.stats["turns"] == 0
@@ -0,0 +1,57 @@
+# file tests/test_startup.py
+"""插件 __init__.py 的启动行为（在子进程中执行，aqt / anki 用占位模块代替）"""
+import os
+import sys
+import json
+import subprocess
+
+from bench_startup import measure
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+
+# 8 个线程同时首次调用 get_cache / get_detector，创建过程放慢以放大竞争窗口
+RACE_SCRIPT = """
+import sys, json, time, threading
+sys.path.insert(0, {tests!r})
+from bench_startup import import_addon
+
+addon = import_addon()
+from edge_tts_addon import detection
+
+created = {{"cache": 0, "detector": 0}}
+
+def slow(kind):
+    class Slow:
+        def __init__(self, *args, **kwargs):
+            created[kind] += 1
+            time.sleep(0.05)
+    return Slow
+
+addon.TTSCache = slow("cache")
+detection.LanguageDetector = slow("detector")
+
+barrier = threading.Barrier(8)
+results = []
+
+def worker():
+    barrier.wait()
+    results.append((addon.get_cache(), addon.get_detector()))
+
+threads = [threading.Thread(target=worker) for _ in range(8)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+created["distinct"] = len(set(results))
+print(json.dumps(created))
+"""
+
+def test_import_does_not_load_heavy_modules():
+    assert measure("addon")["heavy"] == []
+
+def test_lazy_singletons_are_created_once_across_threads():
+    output = subprocess.run(
+        [sys.executable, "-c", RACE_SCRIPT.format(tests=TESTS)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    assert json.loads(output.strip().splitlines()[-1]) == {"cache": 1, "detector": 1, "distinct": 1}